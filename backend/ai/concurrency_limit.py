@@ -0,0 +1,38 @@
+import asyncio
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# Log the backlog of a limit once this share of its capacity is queued or running
+BUSY_LOG_RATIO = 0.8
+
+class ConcurrencyLimit:
+    """
+    Async context manager allowing at most max_concurrency callers in at once, the rest wait in FIFO order
+    Logs its queue depth while it is nearly saturated, which is when requests start waiting on the backend
+    """
+
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = 0  # Callers waiting or running
+        # With a single slot (Stable Diffusion's default) any share of it is the whole of it, only log when callers wait
+        self._busy_log_pending = math.ceil(max_concurrency * BUSY_LOG_RATIO) if max_concurrency > 1 else max_concurrency + 1
+
+    async def __aenter__(self):
+        self._pending += 1
+        if self._pending >= self._busy_log_pending:
+            waiting = max(self._pending - self.max_concurrency, 0)
+            logger.info(f"{self.name}: {self._pending - waiting} of {self.max_concurrency} slots busy, {waiting} waiting")
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            self._pending -= 1
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+        self._pending -= 1
@@ -0,0 +1,100 @@
+import logging
+import os
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_BASE_URL = f"{OLLAMA_HOST}/api"
+SD_BASE_URL = "http://localhost:7860/sdapi/v1"
+SUNO_API_URL = "https://api.suno.ai/v1"
+SUNO_API_KEY = os.environ.get("SUNO_API_KEY", "")  # Get from environment variables
+# Use the official ollama package for text generation instead of the raw HTTP client, when it is installed
+OLLAMA_NATIVE_CLIENT = os.environ.get("OLLAMA_NATIVE_CLIENT", "0") == "1"
+
+DEFAULT_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=40)
+# Music generation takes minutes, so keep more (and longer lived) connections around for concurrent sessions
+SUNO_LIMITS = httpx.Limits(max_keepalive_connections=50, max_connections=100, keepalive_expiry=300)
+
+# Shared clients, one per backend, so keep-alive connections are reused between requests
+OLLAMA_CLIENT: Optional[httpx.AsyncClient] = None
+SD_CLIENT: Optional[httpx.AsyncClient] = None
+SUNO_CLIENT: Optional[httpx.AsyncClient] = None
+NATIVE_OLLAMA_CLIENT = None
+
+def _create_ollama_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(base_url=OLLAMA_BASE_URL, limits=DEFAULT_LIMITS, timeout=httpx.Timeout(60.0))
+
+def _create_sd_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(base_url=SD_BASE_URL, limits=DEFAULT_LIMITS, timeout=httpx.Timeout(120.0))
+
+def _create_suno_client() -> httpx.AsyncClient:
+    # HTTP/2 multiplexes concurrent requests over a single TLS connection
+    return httpx.AsyncClient(
+        base_url=SUNO_API_URL,
+        http2=True,
+        headers={
+            "Authorization": f"Bearer {SUNO_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        limits=SUNO_LIMITS,
+        timeout=httpx.Timeout(180.0, connect=10.0)
+    )
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """Return the shared Ollama client, creating it if the app startup hook has not run"""
+    global OLLAMA_CLIENT
+    if OLLAMA_CLIENT is None or OLLAMA_CLIENT.is_closed:
+        OLLAMA_CLIENT = _create_ollama_client()
+    return OLLAMA_CLIENT
+
+def get_sd_client() -> httpx.AsyncClient:
+    """Return the shared Stable Diffusion client"""
+    global SD_CLIENT
+    if SD_CLIENT is None or SD_CLIENT.is_closed:
+        SD_CLIENT = _create_sd_client()
+    return SD_CLIENT
+
+def get_suno_client() -> httpx.AsyncClient:
+    """Return the shared Suno client"""
+    global SUNO_CLIENT
+    if SUNO_CLIENT is None or SUNO_CLIENT.is_closed:
+        SUNO_CLIENT = _create_suno_client()
+    return SUNO_CLIENT
+
+def get_native_ollama_client():
+    """Return the shared ollama.AsyncClient, or None if it is disabled or the ollama package isn't installed"""
+    global NATIVE_OLLAMA_CLIENT
+    if not OLLAMA_NATIVE_CLIENT:
+        return None
+    if NATIVE_OLLAMA_CLIENT is None:
+        try:
+            from ollama import AsyncClient
+            NATIVE_OLLAMA_CLIENT = AsyncClient(host=OLLAMA_HOST, timeout=60.0)
+        except ImportError:
+            logger.warning("OLLAMA_NATIVE_CLIENT is set but the ollama package isn't installed, using the HTTP client")
+            return None
+    return NATIVE_OLLAMA_CLIENT
+
+async def init_http_clients():
+    """Create the shared HTTP clients (called on app startup)"""
+    get_ollama_client()
+    get_sd_client()
+    get_suno_client()
+    logger.info("HTTP clients initialized")
+
+async def close_http_clients():
+    """Close the shared HTTP clients (called on app shutdown)"""
+    global OLLAMA_CLIENT, SD_CLIENT, SUNO_CLIENT
+    clients: Dict[str, Optional[httpx.AsyncClient]] = {
+        "ollama": OLLAMA_CLIENT,
+        "sd": SD_CLIENT,
+        "suno": SUNO_CLIENT,
+    }
+    for name, client in clients.items():
+        if client is not None and not client.is_closed:
+            await client.aclose()
+            logger.info(f"Closed {name} HTTP client")
+    OLLAMA_CLIENT = SD_CLIENT = SUNO_CLIENT = None
@@ -1,28 +1,43 @@
-import httpx
+import os
 
-SD_BASE_URL = "http://localhost:7860/sdapi/v1"
+import orjson
+
+from ai import image_cache, singleflight
+from ai.concurrency_limit import ConcurrencyLimit
+from ai.http_clients import get_sd_client
+
+# Stable Diffusion renders one image at a time, concurrent requests queue here rather than in the SD server
+SD_MAX_CONCURRENCY = int(os.environ.get("SD_MAX_CONCURRENCY", "1"))
+_sd_limit = ConcurrencyLimit("Stable Diffusion", SD_MAX_CONCURRENCY)
+
+NEGATIVE_PROMPT = "poor quality, deformed, blurry, bad anatomy, bad proportions, extra limbs, out of frame, watermark, signature, text"
+
+# Static part of the txt2img request, only the prompt changes between calls
+_TXT2IMG_PAYLOAD_TEMPLATE = {
+    "negative_prompt": NEGATIVE_PROMPT,
+    "width": 512,
+    "height": 512,
+    "steps": 30,
+    "guidance_scale": 7.5  # Stronger adherence to prompt
+}
 
 async def generate_image(prompt: str):
-    """Generate image using Stable Diffusion API"""
+    """Generate image using Stable Diffusion API, identical requests are served from the image cache"""
+    payload = {**_TXT2IMG_PAYLOAD_TEMPLATE, "prompt": prompt}
+    key = image_cache.make_image_cache_key(payload)
+    # Concurrent identical requests share a single SD call
+    return await singleflight.do(
+        f"image:{key}",
+        lambda: image_cache.get_or_set(key, lambda: _generate_image_uncached(payload))
+    )
+
+async def _generate_image_uncached(payload: dict):
     try:
-        negative_prompt = "poor quality, deformed, blurry, bad anatomy, bad proportions, extra limbs, out of frame, watermark, signature, text"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{SD_BASE_URL}/txt2img",
-                json={
-                    "prompt": prompt,
-                    "negative_prompt": negative_prompt,
-                    "width": 512,
-                    "height": 512,
-                    "steps": 30,
-                    "guidance_scale": 7.5  # Stronger adherence to prompt
-                },
-                timeout=120.0
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data["images"][0]  # Base64 encoded image
+        async with _sd_limit:
+            response = await get_sd_client().post("/txt2img", json=payload)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        return data["images"][0]  # Base64 encoded image
     except Exception as e:
         print(f"Error generating image: {str(e)}")
         return None
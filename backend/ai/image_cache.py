@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_MAX_SIZE = int(os.environ.get("IMAGE_CACHE_SIZE", "256"))  # ~50 MB of base64 images
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "")  # Spill images to disk when set, e.g. data/img_cache
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_lock = asyncio.Lock()
+
+def make_image_cache_key(payload: dict) -> str:
+    """Build the cache key for a txt2img payload, prompts that only differ in case or whitespace share a key"""
+    key_payload = {**payload, "prompt": _normalize_prompt(payload.get("prompt", ""))}
+    return hashlib.sha256(orjson.dumps(key_payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _normalize_prompt(prompt: str) -> str:
+    # The CLIP tokenizer lowercases the prompt and collapses whitespace, so these prompts render the same image
+    return " ".join(prompt.split()).lower()
+
+async def get_or_set(key: str, coro_factory: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+    """Return the cached image for the key, or generate and cache it; failed generations (None) aren't cached"""
+    async with _lock:
+        image = _cache.get(key)
+        if image is not None:
+            _cache.move_to_end(key)
+            logger.info("Image cache hit")
+            return image
+
+    image = await asyncio.to_thread(_read_from_disk, key)
+    if image is None:
+        image = await coro_factory()
+        if image is None:
+            return None
+        await asyncio.to_thread(_write_to_disk, key, image)
+
+    async with _lock:
+        _cache[key] = image
+        _cache.move_to_end(key)
+        while len(_cache) > IMAGE_CACHE_MAX_SIZE:
+            _cache.popitem(last=False)
+    return image
+
+def _disk_path(key: str) -> str:
+    return os.path.join(IMAGE_CACHE_DIR, f"{key}.b64")
+
+def _read_from_disk(key: str) -> Optional[str]:
+    if not IMAGE_CACHE_DIR:
+        return None
+    try:
+        with open(_disk_path(key), "r", encoding="ascii") as f:
+            logger.info("Image disk cache hit")
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"Failed to read cached image: {e}")
+        return None
+
+def _write_to_disk(key: str, image: str):
+    if not IMAGE_CACHE_DIR:
+        return
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        with open(_disk_path(key), "w", encoding="ascii") as f:
+            f.write(image)
+    except Exception as e:
+        logger.error(f"Failed to write cached image: {e}")
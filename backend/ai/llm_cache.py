@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "0") == "1"
+LLM_CACHE_MAX_SIZE = 512
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join("data", "llm_cache.json"))
+LLM_CACHE_PERSIST_DELAY = 5.0  # Seconds to wait before writing the cache to disk
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_lock = asyncio.Lock()
+_persist_task: Optional[asyncio.Task] = None
+
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_LLM_CACHE", "0") == "1"
+SEMANTIC_CACHE_MODEL = os.environ.get("SEMANTIC_LLM_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX_SIZE = 1024
+
+# Strips the slot values (quoted titles, numbers) so prompts built from the same template share a bucket
+_STRUCTURAL_STRIP_RE = re.compile(r'"[^"]*"|\'[^\']*\'|\d+')
+
+_embedder = None
+_embedder_failed = False
+# Bucket key -> (normalized embeddings matrix, responses)
+_semantic_buckets: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+_semantic_order: List[str] = []
+_semantic_lock = asyncio.Lock()
+
+def make_cache_key(model: str, prompt: str) -> str:
+    """Build the exact-match cache key for a model/prompt pair"""
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+async def get_cached_response(key: str) -> Optional[str]:
+    """Return the cached response for the key, if any"""
+    if not LLM_CACHE_ENABLED:
+        return None
+
+    async with _lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+        return result
+
+async def set_cached_response(key: str, response: str):
+    """Store a response in the cache, evicting the least recently used entry when full"""
+    if not LLM_CACHE_ENABLED:
+        return
+
+    async with _lock:
+        _cache[key] = response
+        _cache.move_to_end(key)
+        while len(_cache) > LLM_CACHE_MAX_SIZE:
+            _cache.popitem(last=False)
+    _schedule_persist()
+
+def make_structural_key(model: str, prompt: str) -> str:
+    """Build a coarse key shared by prompts that only differ in quoted strings or numbers"""
+    template = _STRUCTURAL_STRIP_RE.sub("", prompt)
+    return make_cache_key(model, template)
+
+async def get_semantic_cached_response(model: str, prompt: str) -> Optional[str]:
+    """Return a cached response for a structurally and semantically similar prompt, if any"""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+
+    bucket_key = make_structural_key(model, prompt)
+    async with _semantic_lock:
+        bucket = _semantic_buckets.get(bucket_key)
+    if bucket is None:
+        return None
+
+    query = await _embed(prompt)
+    if query is None:
+        return None
+
+    embeddings, responses = bucket
+    scores = embeddings @ query
+    best_index = int(np.argmax(scores))
+    if scores[best_index] < SEMANTIC_CACHE_THRESHOLD:
+        return None
+    logger.info(f"Semantic LLM cache hit (similarity: {scores[best_index]:.3f})")
+    return responses[best_index]
+
+async def set_semantic_cached_response(model: str, prompt: str, response: str):
+    """Store a response in the semantic cache"""
+    if not SEMANTIC_CACHE_ENABLED:
+        return
+
+    embedding = await _embed(prompt)
+    if embedding is None:
+        return
+
+    bucket_key = make_structural_key(model, prompt)
+    async with _semantic_lock:
+        embeddings, responses = _semantic_buckets.get(bucket_key, (np.empty((0, embedding.shape[0]), dtype=np.float32), []))
+        _semantic_buckets[bucket_key] = (np.vstack([embeddings, embedding]), responses + [response])
+        _semantic_order.append(bucket_key)
+        # Evict the oldest entries once the cache is full
+        while len(_semantic_order) > SEMANTIC_CACHE_MAX_SIZE:
+            oldest_key = _semantic_order.pop(0)
+            oldest_embeddings, oldest_responses = _semantic_buckets[oldest_key]
+            if len(oldest_responses) <= 1:
+                del _semantic_buckets[oldest_key]
+            else:
+                _semantic_buckets[oldest_key] = (oldest_embeddings[1:], oldest_responses[1:])
+
+async def _embed(prompt: str) -> Optional[np.ndarray]:
+    embedder = _get_embedder()
+    if embedder is None:
+        return None
+    try:
+        embedding = await asyncio.to_thread(embedder.encode, prompt, normalize_embeddings=True)
+        return np.asarray(embedding, dtype=np.float32)
+    except Exception as e:
+        logger.error(f"Failed to embed prompt for semantic cache: {e}")
+        return None
+
+def _get_embedder():
+    """Load the embedding model on first use; sentence-transformers is an optional dependency"""
+    global _embedder, _embedder_failed
+    if _embedder is None and not _embedder_failed:
+        try:
+            from sentence_transformers import SentenceTransformer
+            _embedder = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+            logger.info(f"Semantic LLM cache using embedding model {SEMANTIC_CACHE_MODEL}")
+        except Exception as e:
+            logger.error(f"Semantic LLM cache disabled, could not load embedding model: {e}")
+            _embedder_failed = True
+    return _embedder
+
+def _schedule_persist():
+    """Debounce writes so a burst of new entries results in a single disk write"""
+    global _persist_task
+    if _persist_task is None or _persist_task.done():
+        _persist_task = asyncio.create_task(_persist_later())
+
+async def _persist_later():
+    await asyncio.sleep(LLM_CACHE_PERSIST_DELAY)
+    async with _lock:
+        snapshot = dict(_cache)
+    try:
+        await asyncio.to_thread(_write_cache_file, snapshot)
+    except Exception as e:
+        logger.error(f"Failed to persist LLM cache: {e}")
+
+def _write_cache_file(snapshot: dict):
+    directory = os.path.dirname(LLM_CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{LLM_CACHE_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, LLM_CACHE_PATH)
+
+def _load_cache_file():
+    if not LLM_CACHE_ENABLED or not os.path.exists(LLM_CACHE_PATH):
+        return
+    try:
+        with open(LLM_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for key, value in list(data.items())[-LLM_CACHE_MAX_SIZE:]:
+            _cache[key] = value
+        logger.info(f"Loaded {len(_cache)} cached LLM responses")
+    except Exception as e:
+        logger.error(f"Failed to load LLM cache: {e}")
+
+_load_cache_file()
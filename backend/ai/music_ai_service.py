@@ -1,35 +1,67 @@
-import os
+import asyncio
+import hashlib
+import logging
+import time
 
 import httpx
+import orjson
 
+from ai import singleflight
+from ai.http_clients import SUNO_API_KEY, get_suno_client
 
-SUNO_API_URL = "https://api.suno.ai/v1"
-SUNO_API_KEY = os.environ.get("SUNO_API_KEY", "")  # Get from environment variables
+logger = logging.getLogger(__name__)
+
+# Circuit breaker: after this many consecutive failures, skip Suno for a while instead of waiting on timeouts
+SUNO_FAILURE_THRESHOLD = 3
+SUNO_COOLDOWN_SECONDS = 60
+
+_suno_failures = 0
+_suno_open_until = 0.0
+_suno_lock = asyncio.Lock()
 
 async def generate_music(prompt: str):
     """Generate background music using Suno AI API"""
     if not SUNO_API_KEY:
         return None
-    
+
+    if time.monotonic() < _suno_open_until:
+        return None
+
+    key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return await singleflight.do(f"music:{key}", lambda: _generate_music_uncached(prompt))
+
+async def _generate_music_uncached(prompt: str):
     try:
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Authorization": f"Bearer {SUNO_API_KEY}",
-                "Content-Type": "application/json"
+        response = await get_suno_client().post(
+            "/generate",
+            json={
+                "prompt": f"Fantasy adventure music for a D&D game: {prompt}",
+                "duration": 120  # 2 minutes
             }
-            response = await client.post(
-                f"{SUNO_API_URL}/generate",
-                headers=headers,
-                json={
-                    "prompt": f"Fantasy adventure music for a D&D game: {prompt}",
-                    "duration": 120  # 2 minutes
-                },
-                timeout=180.0
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data.get("url")
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        await _record_suno_success()
+        return data.get("url")
+    except httpx.HTTPError as e:
+        print(f"Error generating music: {str(e)}")
+        await _record_suno_failure()
+        return None
     except Exception as e:
         print(f"Error generating music: {str(e)}")
         return None
-    
+
+async def _record_suno_success():
+    global _suno_failures
+    async with _suno_lock:
+        _suno_failures = 0
+
+async def _record_suno_failure():
+    global _suno_failures, _suno_open_until
+    async with _suno_lock:
+        _suno_failures += 1
+        if _suno_failures >= SUNO_FAILURE_THRESHOLD:
+            _suno_open_until = time.monotonic() + SUNO_COOLDOWN_SECONDS
+            _suno_failures = 0
+            logger.warning(f"Suno failed {SUNO_FAILURE_THRESHOLD} times in a row, skipping music for {SUNO_COOLDOWN_SECONDS}s")
+
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+class _Call:
+    """A running call and the number of callers still waiting for it"""
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+# Key -> call currently running for that key
+_inflight: Dict[str, _Call] = {}
+
+async def do(key: str, factory: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run factory() once per key at a time
+    Concurrent callers with the same key wait for the running call and share its result (or exception)
+    The call runs in its own task, so a cancelled caller doesn't cancel it for the others, it is only cancelled once all its callers are
+    """
+    call = _inflight.get(key)
+    if call is None:
+        call = _Call(asyncio.create_task(factory()))
+        _inflight[key] = call
+        call.task.add_done_callback(lambda task: _forget(key, call))
+    call.waiters += 1
+    try:
+        return await asyncio.shield(call.task)
+    except asyncio.CancelledError:
+        if call.waiters == 1 and not call.task.done():
+            # Later callers start a new call instead of joining the cancelled one
+            _forget_key(key, call)
+            call.task.cancel()
+        raise
+    finally:
+        call.waiters -= 1
+
+def _forget(key: str, call: _Call):
+    _forget_key(key, call)
+    # Mark the exception as retrieved, every caller may have been cancelled
+    if not call.task.cancelled():
+        call.task.exception()
+
+def _forget_key(key: str, call: _Call):
+    if _inflight.get(key) is call:
+        del _inflight[key]
@@ -1,41 +1,147 @@
 import logging
+import os
+from typing import AsyncIterator, Optional
 
+import orjson
 from fastapi import HTTPException
-import httpx
+from ai import singleflight
+from ai.concurrency_limit import ConcurrencyLimit
+from ai.http_clients import get_native_ollama_client, get_ollama_client
+from ai.llm_cache import get_cached_response, get_semantic_cached_response, make_cache_key, set_cached_response, set_semantic_cached_response
 from utilities.prompt_constants import PromptConstants
 
 logger = logging.getLogger(__name__)
 
-OLLAMA_BASE_URL = "http://localhost:11434/api"
+# How long Ollama keeps the model loaded after a request, so the next turn doesn't pay for reloading it
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "10m")
+# Requests Ollama processes at once, extra requests wait here instead of making Ollama thrash between them
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_NUM_PARALLEL", "2"))
+_ollama_limit = ConcurrencyLimit("Ollama", OLLAMA_MAX_CONCURRENCY)
 
-async def generate_text(prompt: str, model: str = "llama3")-> str:
-    """Generate text using Ollama API"""
+async def generate_text(prompt: str, model: str = "llama3", system: Optional[str] = None, json_output: bool = False)-> str:
+    """
+    Generate text using Ollama API
+    The static instructions belong in system, Ollama keeps them as the prompt prefix so their KV cache is reused between calls
+    json_output constrains the response to a JSON object, the prompt should describe its fields
+    """
     try:
-        # Add formatting reminders to help with parsing
-        if PromptConstants.ACTIONS in prompt or "action choices" in prompt:
-            prompt += f"\n\nIMPORTANT FORMATTING INSTRUCTIONS:\n" \
-                     f"- Always start your response with '{PromptConstants.STORY}'\n" \
-                     f"- Then add '{PromptConstants.ACTIONS}' on a new line before listing the actions\n" \
-                     "- Number each action with a digit followed by a period (1., 2., etc.)"
-                     
-        # Add a formatting reminder for chapter titles
-        if PromptConstants.NEXT_CHAPTER in prompt:
-            prompt += "\n\nNote: The NEXT CHAPTER title should be brief (3-7 words) and on its own line."
+        if not json_output:
+            prompt = _add_formatting_reminders(prompt)
+        cache_prompt = _make_cache_prompt(prompt, system)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{OLLAMA_BASE_URL}/generate",
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False
-                },
-                timeout=60.0
+        cache_key = make_cache_key(model, cache_prompt)
+        cached_result = await get_cached_response(cache_key)
+        if cached_result is not None:
+            logger.info(f"LLM cache hit (length: {len(cached_result)})")
+            return cached_result
+        
+        cached_result = await get_semantic_cached_response(model, cache_prompt)
+        if cached_result is not None:
+            return cached_result
+        
+        # Identical prompts already being generated share the running request
+        return await singleflight.do(f"text:{cache_key}", lambda: _generate_text_uncached(prompt, model, system, cache_key, json_output))
+    except Exception as e:
+        logger.error(f"Error generating text: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Text generation failed: {str(e)}")
+
+async def _generate_text_uncached(prompt: str, model: str, system: Optional[str], cache_key: str, json_output: bool = False)-> str:
+    native_client = get_native_ollama_client()
+    async with _ollama_limit:
+        if native_client is not None:
+            native_response = await native_client.generate(**_make_generate_payload(prompt, model, system, stream=False, json_output=json_output))
+            result = native_response["response"]
+        else:
+            response = await get_ollama_client().post(
+                "/generate",
+                json=_make_generate_payload(prompt, model, system, stream=False, json_output=json_output)
             )
             response.raise_for_status()
-            result = response.json()["response"]
-            logger.info(f"Response received (length: {len(result)})")
-            return result
+            # orjson straight from the bytes, the response also carries a large context token array
+            result = orjson.loads(response.content)["response"]
+    logger.info(f"Response received (length: {len(result)})")
+    await set_cached_response(cache_key, result)
+    await set_semantic_cached_response(model, _make_cache_prompt(prompt, system), result)
+    return result
+
+async def generate_text_stream(prompt: str, model: str = "llama3", system: Optional[str] = None)-> AsyncIterator[str]:
+    """Generate text using Ollama API, yielding response fragments as soon as they are produced"""
+    prompt = _add_formatting_reminders(prompt)
+    cache_prompt = _make_cache_prompt(prompt, system)
+    cache_key = make_cache_key(model, cache_prompt)
+    cached_result = await get_cached_response(cache_key)
+    if cached_result is not None:
+        logger.info(f"LLM cache hit (length: {len(cached_result)})")
+        yield cached_result
+        return
+    
+    fragments = []
+    try:
+        async with _ollama_limit, get_ollama_client().stream(
+            "POST",
+            "/generate",
+            json=_make_generate_payload(prompt, model, system, stream=True)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = orjson.loads(line)
+                fragment = chunk.get("response", "")
+                if fragment:
+                    fragments.append(fragment)
+                    yield fragment
+                if chunk.get("done"):
+                    break
     except Exception as e:
-        logger.error(f"Error generating text: {str(e)}")
+        logger.error(f"Error streaming text: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Text generation failed: {str(e)}")
+    
+    result = "".join(fragments)
+    logger.info(f"Streamed response received (length: {len(result)})")
+    await set_cached_response(cache_key, result)
+    await set_semantic_cached_response(model, cache_prompt, result)
+
+async def warm_up_model(model: str):
+    """Load the model into Ollama's memory ahead of the first request, a generate call without a prompt only loads the model"""
+    try:
+        response = await get_ollama_client().post(
+            "/generate",
+            json={"model": model, "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=300.0
+        )
+        response.raise_for_status()
+        logger.info(f"Model {model} loaded")
+    except Exception as e:
+        # Not fatal, the first request loads the model instead
+        logger.warning(f"Failed to preload model {model}: {str(e)}")
+
+def _make_generate_payload(prompt: str, model: str, system: Optional[str], stream: bool, json_output: bool = False)-> dict:
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE
+    }
+    if system:
+        payload["system"] = system
+    if json_output:
+        payload["format"] = "json"
+    return payload
+
+def _make_cache_prompt(prompt: str, system: Optional[str])-> str:
+    """The text the response caches are keyed on, the same prompt with a different system prompt is a different request"""
+    return f"{system}\0{prompt}" if system else prompt
+
+def _add_formatting_reminders(prompt: str)-> str:
+    """Add formatting reminders to help with parsing"""
+    if PromptConstants.ACTIONS in prompt or "action choices" in prompt:
+        prompt += f"\n\nIMPORTANT FORMATTING INSTRUCTIONS:\n" \
+                 f"- Always start your response with '{PromptConstants.STORY}'\n" \
+                 f"- Then add '{PromptConstants.ACTIONS}' on a new line before listing the actions\n" \
+                 "- Number each action with a digit followed by a period (1., 2., etc.)"
+                 
+    # Add a formatting reminder for chapter titles
+    if PromptConstants.NEXT_CHAPTER in prompt:
+        prompt += "\n\nNote: The NEXT CHAPTER title should be brief (3-7 words) and on its own line."
+    return prompt
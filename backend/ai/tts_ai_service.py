@@ -1,34 +1,112 @@
 # Configure logging
+import asyncio
 import base64
+import hashlib
 import io
 import logging
-from typing import Optional
+import os
+import re
+import struct
+from collections import OrderedDict
+from typing import AsyncIterator, Literal, Optional, Tuple, Union
 from fastapi import HTTPException
 from kokoro import KPipeline
 import numpy as np
-from scipy.io import wavfile
+import torch
+from ai.tts_worker import create_tts_worker_pool, quantize_pipeline, synthesize_sentence, synthesize_sentence_in_worker
 
 logger = logging.getLogger(__name__)
 
-# Initialize Kokoro TTS pipeline once at module level
-logger.info("Initializing Kokoro TTS pipeline...")
-try:
-    KOKORO_PIPELINE = KPipeline(lang_code='b')  # 'b' for English
-    logger.info("Kokoro TTS pipeline initialized successfully")
-except Exception as e:
-    logger.error(f"Error initializing Kokoro TTS pipeline: {e}")
-    KOKORO_PIPELINE = None
+# Number of dedicated TTS worker processes, 0 runs Kokoro in threads of this process
+TTS_WORKER_PROCESSES = int(os.environ.get("TTS_WORKER_PROCESSES", "0"))
+# Reduced precision for the Kokoro weights: "int8" (CPU), "fp16" (GPU) or empty for FP32
+TTS_QUANTIZE = os.environ.get("TTS_QUANTIZE", "").lower()
+KOKORO_PIPELINE = None
+TTS_WORKER_POOL = None
 
-async def generate_tts(text: str, voice='bm_george')-> Optional[str]:
+if TTS_WORKER_PROCESSES > 0:
+    logger.info(f"Starting {TTS_WORKER_PROCESSES} Kokoro TTS worker process(es)...")
+    try:
+        TTS_WORKER_POOL = create_tts_worker_pool(TTS_WORKER_PROCESSES, lang_code='b', quantize=TTS_QUANTIZE)  # 'b' for English
+    except Exception as e:
+        logger.error(f"Error starting Kokoro TTS worker processes: {e}")
+else:
+    # Initialize Kokoro TTS pipeline once at module level
+    logger.info("Initializing Kokoro TTS pipeline...")
+    try:
+        KOKORO_PIPELINE = quantize_pipeline(KPipeline(lang_code='b'), TTS_QUANTIZE)  # 'b' for English
+        logger.info("Kokoro TTS pipeline initialized successfully")
+    except Exception as e:
+        logger.error(f"Error initializing Kokoro TTS pipeline: {e}")
+
+# Send the whole text to Kokoro in one call and let it split on sentences internally
+TTS_BATCH = os.environ.get("TTS_BATCH", "0") == "1"
+
+# Sentences synthesized at once: one per worker process, or TTS_MAX_CONCURRENCY threads sharing the in-process pipeline
+# A torch forward pass already uses every core, so in-process sentences run one at a time unless configured otherwise,
+# real parallelism comes from TTS_WORKER_PROCESSES
+TTS_MAX_CONCURRENCY = TTS_WORKER_PROCESSES if TTS_WORKER_POOL is not None else int(os.environ.get("TTS_MAX_CONCURRENCY", "1"))
+_tts_semaphore = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+if KOKORO_PIPELINE is not None and TTS_MAX_CONCURRENCY > 1:
+    # Split the cores between the concurrent forward passes instead of oversubscribing them
+    torch.set_num_threads(max((os.cpu_count() or 1) // TTS_MAX_CONCURRENCY, 1))
+
+SAMPLE_RATE = 24000  # Kokoro default
+# Placeholder size used in the WAV header of streamed audio, whose length is unknown up front
+_STREAMING_DATA_SIZE = 0xFFFFFFFF - 36
+
+TTSAudioFormat = Literal["wav", "opus", "mp3"]
+# Container format and codec used by PyAV for the compressed formats
+_COMPRESSED_AUDIO_CODECS = {
+    "opus": ("ogg", "libopus"),
+    "mp3": ("mp3", "libmp3lame"),
+}
+COMPRESSED_AUDIO_BIT_RATE = 32000
+AUDIO_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "opus": "audio/ogg",
+    "mp3": "audio/mpeg",
+}
+WAV_HEADER_SIZE = 44
+# The "fmt " chunk is the same for every file (24 kHz, mono, 16-bit), only the sizes around it change
+_WAV_FMT_CHUNK = struct.pack('<4sIHHIIHH', b'fmt ', 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16)
+
+# Base64 audio kept as bytes (not str) for replaying the same text, keyed by (voice, format, text hash)
+TTS_CACHE_MAX_SIZE = 64
+_tts_cache: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+
+# Split on sentence ending punctuation followed by spaces or end of string
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+|(?<=[.!?])$')
+
+async def generate_tts(text: str, voice='bm_george', audio_format: TTSAudioFormat = "wav")-> Optional[str]:
+    """
+    Generate text-to-speech audio using Kokoro
+    Returns base64-encoded audio data, 16-bit PCM WAV by default or Opus/MP3 at 32 kbps
+    """
+    cache_key = (voice, audio_format, hashlib.sha256(text.encode("utf-8")).hexdigest())
+    audio_base64 = _tts_cache.get(cache_key)
+    if audio_base64 is None:
+        audio_bytes = await generate_tts_audio(text, voice, audio_format)
+        audio_base64 = base64.b64encode(audio_bytes)
+        _tts_cache[cache_key] = audio_base64
+        while len(_tts_cache) > TTS_CACHE_MAX_SIZE:
+            _tts_cache.popitem(last=False)
+    else:
+        logger.info("TTS cache hit")
+    _tts_cache.move_to_end(cache_key)
+    # Only decode to str for the response itself
+    return audio_base64.decode('ascii')
+
+async def generate_tts_audio(text: str, voice='bm_george', audio_format: TTSAudioFormat = "wav")-> Union[bytes, bytearray]:
     """
     Generate text-to-speech audio using Kokoro
-    Returns base64-encoded MP3 audio data
+    Returns the raw encoded audio file, see AUDIO_MEDIA_TYPES for its media type
     """
     if not text:
         raise HTTPException(status_code=400, detail="Text is required")
         
     # Check if the pipeline was initialized successfully
-    if KOKORO_PIPELINE is None:
+    if not _is_tts_available():
         logger.error("Kokoro TTS pipeline is not available")
         raise HTTPException(status_code=500, detail="TTS service is not available")
     
@@ -36,44 +114,42 @@ async def generate_tts(text: str, voice='bm_george')-> Optional[str]:
         # Use the global pipeline instead of creating a new one
         pipeline = KOKORO_PIPELINE
         
-        # Process the text in sentences for better quality
-        audios = []
-        sample_rate = 24000  # Kokoro default
+        sample_rate = SAMPLE_RATE
         
-        # Clean and split text into sentences for better processing
-        sentences = _split_into_sentences(text)
-        
-        for sentence in sentences:
-            if not sentence.strip():
-                continue
-                
-            # Generate audio for this sentence
-            generator = pipeline(
-                sentence, 
-                voice=voice,  # Voice option
-                speed=1.0,    # Normal speed
-                split_pattern=None  # Don't split further
-            )
+        if TTS_BATCH:
+            # A single pipeline call amortizes the per-call overhead over all sentences
+            audios = [await _synthesize_sentence_bounded(pipeline, text, voice, split_pattern=_SENTENCE_SPLIT_RE.pattern)]
+        else:
+            # Clean and split text into sentences for better processing
+            sentences = _split_into_sentences(text)
             
-            # Collect audio from the generator
-            for _, _, audio in generator:
-                # Convert PyTorch tensor to numpy array
-                audio_np = audio.numpy()
-                audios.append(audio_np)
+            # Synthesize the sentences in parallel worker threads, gather keeps them in order
+            audios = await asyncio.gather(*[
+                _synthesize_sentence_bounded(pipeline, sentence, voice)
+                for sentence in sentences
+                if sentence.strip()
+            ])
+        audios = [audio for audio in audios if audio is not None]
         
-        # Concatenate all audio segments
+        # Write all audio segments into a single pre-allocated 16-bit PCM buffer
         if audios:
-            full_audio = np.concatenate(audios)
+            total_samples = sum(audio.shape[0] for audio in audios)
+            if audio_format == "wav":
+                # Write the PCM samples straight after the WAV header, so the file is never copied
+                audio_buffer = bytearray(WAV_HEADER_SIZE + total_samples * 2)
+                audio_buffer[:WAV_HEADER_SIZE] = _create_wav_header(total_samples * 2)
+                pcm_audio = np.frombuffer(audio_buffer, dtype=np.int16, offset=WAV_HEADER_SIZE)
+            else:
+                pcm_audio = np.empty(total_samples, dtype=np.int16)
             
-            # Convert to WAV format using scipy
-            output_buffer = io.BytesIO()
-            wavfile.write(output_buffer, sample_rate, full_audio)
+            offset = 0
+            for audio in audios:
+                pcm_audio[offset:offset + audio.shape[0]] = audio
+                offset += audio.shape[0]
             
-            # Convert to base64 for transmission
-            output_buffer.seek(0)
-            audio_base64 = base64.b64encode(output_buffer.read()).decode('utf-8')
-            
-            return audio_base64
+            if audio_format == "wav":
+                return audio_buffer
+            return await asyncio.to_thread(_encode_compressed_audio, pcm_audio, sample_rate, audio_format)
         else:
             raise HTTPException(status_code=500, detail="Failed to generate audio")
             
@@ -81,11 +157,83 @@ async def generate_tts(text: str, voice='bm_george')-> Optional[str]:
         logger.error(f"Error generating TTS: {e}")
         raise HTTPException(status_code=500, detail=f"TTS generation failed: {str(e)}")
 
+def generate_tts_stream(text: str, voice='bm_george')-> AsyncIterator[bytes]:
+    """
+    Generate text-to-speech audio using Kokoro as a progressive stream
+    Returns an iterator yielding a WAV header followed by 16-bit PCM chunks, one per sentence as soon as it is ready
+    """
+    if not text:
+        raise HTTPException(status_code=400, detail="Text is required")
+        
+    # Validate before streaming starts, errors can't change the response status afterwards
+    if not _is_tts_available():
+        logger.error("Kokoro TTS pipeline is not available")
+        raise HTTPException(status_code=500, detail="TTS service is not available")
+    
+    return _stream_tts(KOKORO_PIPELINE, text, voice)
+
+async def _stream_tts(pipeline: Optional[KPipeline], text: str, voice: str) -> AsyncIterator[bytes]:
+    sentences = [sentence for sentence in _split_into_sentences(text) if sentence.strip()]
+    
+    # Start every sentence right away, but emit them strictly in order
+    tasks = [asyncio.create_task(_synthesize_sentence_bounded(pipeline, sentence, voice)) for sentence in sentences]
+    try:
+        yield _create_wav_header(_STREAMING_DATA_SIZE)
+        for task in tasks:
+            audio = await task
+            if audio is not None:
+                yield audio.tobytes()
+    except Exception as e:
+        logger.error(f"Error streaming TTS: {e}")
+        raise
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def _create_wav_header(data_size: int) -> bytes:
+    """Create the WAV_HEADER_SIZE-byte header for mono 16-bit PCM WAV audio at SAMPLE_RATE"""
+    return b''.join((
+        struct.pack('<4sI4s', b'RIFF', 36 + data_size, b'WAVE'),
+        _WAV_FMT_CHUNK,
+        struct.pack('<4sI', b'data', data_size)
+    ))
+
+def _encode_compressed_audio(pcm_audio: np.ndarray, sample_rate: int, audio_format: TTSAudioFormat) -> bytes:
+    """Encode mono 16-bit PCM to Opus (in Ogg) or MP3, PyAV is only needed for these formats"""
+    import av
+    container_format, codec = _COMPRESSED_AUDIO_CODECS[audio_format]
+    output_buffer = io.BytesIO()
+    with av.open(output_buffer, 'w', format=container_format) as container:
+        stream = container.add_stream(codec, rate=sample_rate)
+        stream.bit_rate = COMPRESSED_AUDIO_BIT_RATE
+        stream.layout = 'mono'
+        
+        frame = av.AudioFrame.from_ndarray(pcm_audio.reshape(1, -1), format='s16', layout='mono')
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        # Flush the encoder
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return output_buffer.getvalue()
+
+def shutdown_tts_workers():
+    """Stop the TTS worker processes, if any (called on app shutdown)"""
+    if TTS_WORKER_POOL is not None:
+        TTS_WORKER_POOL.shutdown(wait=False, cancel_futures=True)
+
+def _is_tts_available() -> bool:
+    return KOKORO_PIPELINE is not None or TTS_WORKER_POOL is not None
+
+async def _synthesize_sentence_bounded(pipeline: Optional[KPipeline], sentence: str, voice: str, split_pattern: Optional[str] = None) -> Optional[np.ndarray]:
+    async with _tts_semaphore:
+        if TTS_WORKER_POOL is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(TTS_WORKER_POOL, synthesize_sentence_in_worker, sentence, voice, split_pattern)
+        return await asyncio.to_thread(synthesize_sentence, pipeline, sentence, voice, split_pattern)
+
 def _split_into_sentences(text):
     """
     Split text into sentences for better TTS processing
     """
-    import re
-    # Split on sentence ending punctuation followed by spaces or end of string
-    sentences = re.split(r'(?<=[.!?])\s+|(?<=[.!?])$', text)
-    return [s for s in sentences if s.strip()]
\ No newline at end of file
+    return [s for s in _SENTENCE_SPLIT_RE.split(text) if s.strip()]
\ No newline at end of file
@@ -0,0 +1,105 @@
+import contextlib
+import copy
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Pipeline owned by a worker process, loaded once by the pool initializer
+_WORKER_PIPELINE = None
+# Synthesized once with a quantized model to check that it works
+_QUANTIZE_TEST_SENTENCE = "Welcome, adventurers."
+
+def quantize_pipeline(pipeline, mode: str, test_voice: str = "bm_george"):
+    """
+    Reduce the precision of the Kokoro model weights
+    'int8' applies dynamic INT8 quantization to the Linear layers (CPU), 'fp16' converts the model to half precision (GPU)
+    Falls back to the FP32 model if the conversion fails or a test sentence can't be synthesized with the converted one
+    """
+    if not mode or pipeline is None or getattr(pipeline, "model", None) is None:
+        return pipeline
+
+    fp32_model = pipeline.model
+    try:
+        if mode == "int8":
+            pipeline.model = torch.quantization.quantize_dynamic(fp32_model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif mode == "fp16":
+            if not torch.cuda.is_available():
+                logger.warning("FP16 TTS quantization requires a GPU, keeping FP32 weights")
+                return pipeline
+            # half() converts in place, keep the FP32 model intact to fall back to
+            pipeline.model = copy.deepcopy(fp32_model).half().cuda()
+        else:
+            logger.warning(f"Unknown TTS quantization mode '{mode}', keeping FP32 weights")
+            return pipeline
+        # Kokoro still feeds FP32 voice tensors to the model, make sure inference actually works before keeping it
+        if synthesize_sentence(pipeline, _QUANTIZE_TEST_SENTENCE, test_voice) is None:
+            raise RuntimeError("test sentence produced no audio")
+        logger.info(f"Kokoro model quantized to {mode}")
+    except Exception as e:
+        pipeline.model = fp32_model
+        logger.error(f"Failed to quantize Kokoro model to {mode}, keeping FP32 weights: {e}")
+    return pipeline
+
+def create_tts_worker_pool(processes: int, lang_code: str = 'b', quantize: str = "") -> ProcessPoolExecutor:
+    """
+    Create a pool of dedicated TTS worker processes, each loading its own Kokoro pipeline
+    Keeps the torch forward pass (and the GIL it holds) out of the web server process
+    """
+    # Spawn rather than fork, torch doesn't survive being forked after initialization
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(lang_code, quantize, max((os.cpu_count() or 1) // processes, 1))
+    )
+
+def synthesize_sentence(pipeline, sentence: str, voice: str, split_pattern: Optional[str] = None) -> Optional[np.ndarray]:
+    """
+    Synthesize a single sentence, returns the audio as 16-bit PCM samples or None if nothing was generated
+    Passing a split_pattern lets Kokoro split (and process) longer text itself
+    """
+    # Generate audio for this sentence
+    generator = pipeline(
+        sentence,
+        voice=voice,  # Voice option
+        speed=1.0,    # Normal speed
+        split_pattern=split_pattern  # None doesn't split further
+    )
+
+    # Collect audio from the generator, converting to int16 in torch so numpy only ever sees half-size samples
+    # The generator runs the model lazily, so it is consumed inside the autocast context
+    with _fp16_autocast(pipeline):
+        chunks = [_to_pcm16(audio) for _, _, audio in generator]
+    if not chunks:
+        return None
+    return np.concatenate(chunks)
+
+def _fp16_autocast(pipeline):
+    """Autocast for a half precision model, so the FP32 voice tensors Kokoro passes are cast to match its weights"""
+    model = getattr(pipeline, "model", None)
+    parameter = next(model.parameters(), None) if model is not None else None
+    if parameter is None or parameter.dtype != torch.float16:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=parameter.device.type, dtype=torch.float16)
+
+def _to_pcm16(audio: torch.Tensor) -> np.ndarray:
+    """Convert a float audio tensor in [-1, 1] to a 16-bit PCM numpy array"""
+    return (audio.detach().clamp(-1.0, 1.0) * 32767).to(torch.int16).cpu().numpy()
+
+def synthesize_sentence_in_worker(sentence: str, voice: str, split_pattern: Optional[str] = None) -> Optional[np.ndarray]:
+    """Entry point executed inside a worker process"""
+    return synthesize_sentence(_WORKER_PIPELINE, sentence, voice, split_pattern)
+
+def _init_worker(lang_code: str, quantize: str, torch_threads: int):
+    global _WORKER_PIPELINE
+    # Each worker gets its share of the cores, instead of every worker's forward pass using all of them
+    torch.set_num_threads(torch_threads)
+    from kokoro import KPipeline
+    _WORKER_PIPELINE = quantize_pipeline(KPipeline(lang_code=lang_code), quantize)
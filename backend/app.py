@@ -1,55 +1,73 @@
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import logging
+import os
 import traceback
 
-from endpoints.generate_tts_endpoint import generate_tts_endpoint
-from endpoints.check_music_endpoint import check_music
-from endpoints.generate_character_icon_endpoint import generate_character_icon
-from endpoints.generate_character_options_endpoint import generate_character_options
-from endpoints.get_available_models_endpoint import get_available_models
-from endpoints.start_new_chapter_endpoint import start_new_chapter
-from endpoints.take_action_endpoint import take_action
+from ai.http_clients import close_http_clients, init_http_clients
+from ai.text_ai_service import warm_up_model
+from ai.tts_ai_service import shutdown_tts_workers
+from endpoints import api_router
+from endpoints.get_scene_image_endpoint import create_scene_image_files, SCENE_IMAGE_ROUTE_NAME, SCENE_IMAGE_URL_PATH
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="D&D AI Game Backend")
+# orjson serializes the large base64 image and audio fields much faster than the stdlib json encoder
+app = FastAPI(title="D&D AI Game Backend", default_response_class=ORJSONResponse)
+
+# Model loaded into Ollama at startup so the first game doesn't wait for it, empty to disable
+OLLAMA_WARMUP_MODEL = os.environ.get("OLLAMA_WARMUP_MODEL", "llama3")
+_background_tasks = set()
+
+@app.on_event("startup")
+async def startup_event():
+    await init_http_clients()
+    if OLLAMA_WARMUP_MODEL:
+        # Not awaited, the server accepts requests while the model loads
+        warm_up_task = asyncio.create_task(warm_up_model(OLLAMA_WARMUP_MODEL))
+        _background_tasks.add(warm_up_task)
+        warm_up_task.add_done_callback(_background_tasks.discard)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_http_clients()
+    shutdown_tts_workers()
 
 # Add global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global exception: {exc}")
-    logger.error(traceback.format_exc())
-    return JSONResponse(
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(traceback.format_exc())
+    return ORJSONResponse(
         status_code=500,
-        content={"detail": f"Internal server error: {str(exc)}"}
+        content={"detail": "Internal server error"}
     )
 
 # Configure CORS with more specific settings
+# Comma separated, e.g. "http://localhost:3000,https://my-game.example.com"
+CORS_ORIGINS = [origin.strip() for origin in os.environ.get("CORS_ORIGINS", "http://localhost:3000").split(",") if origin.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins like "http://localhost:3000"
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
 )
 
-# Register endpoints with logger
-app.post("/api/generate-character-options")(generate_character_options)
-app.post("/api/generate-character-icon")(generate_character_icon)
-app.post("/api/take-action")(take_action)
-app.post("/api/start-new-chapter")(start_new_chapter)
-app.get("/api/check-music")(check_music)
-app.get("/api/models")(get_available_models)
-
-# Register the new TTS endpoint
-app.post("/api/generate-tts")(generate_tts_endpoint)
+# Register endpoints
+app.include_router(api_router)
+# Background generated scene images, saved under the hash of their content
+app.mount(SCENE_IMAGE_URL_PATH, create_scene_image_files(), name=SCENE_IMAGE_ROUTE_NAME)
 
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting API server...")
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    # "auto" picks uvloop and httptools when installed (they are in requirements.txt, uvloop isn't available on Windows)
+    workers = int(os.environ.get("API_WORKERS", "1"))
+    uvicorn.run("app:app" if workers > 1 else app, host="0.0.0.0", port=8000, log_level="info", loop="auto", http="auto", workers=workers)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+
+from endpoints.generate_tts_endpoint import generate_tts_endpoint
+from endpoints.check_music_endpoint import check_music
+from endpoints.generate_character_icon_endpoint import generate_character_icon
+from endpoints.generate_character_options_endpoint import generate_character_options
+from endpoints.get_available_models_endpoint import get_available_models
+from endpoints.get_scene_image_endpoint import get_scene_image, get_scene_image_png
+from endpoints.start_new_chapter_endpoint import start_new_chapter
+from endpoints.take_action_endpoint import take_action, take_action_stream
+
+# All API routes, included once by the app
+api_router = APIRouter(prefix="/api")
+
+api_router.post("/generate-character-options")(generate_character_options)
+api_router.post("/generate-character-icon")(generate_character_icon)
+api_router.post("/take-action")(take_action)
+api_router.post("/take-action-stream")(take_action_stream)
+api_router.post("/start-new-chapter")(start_new_chapter)
+api_router.get("/check-music")(check_music)
+api_router.get("/models")(get_available_models)
+api_router.get("/scene-image/{job_id}")(get_scene_image)
+api_router.get("/scene-image/{job_id}/png")(get_scene_image_png)
+api_router.post("/generate-tts")(generate_tts_endpoint)
@@ -1,5 +1,8 @@
-async def check_music():
-    """Endpoint to check if background music is ready (placeholder)"""
-    # In a real implementation, this would check the status of the music generation
-    # and return the URL when it's ready
-    return {"status": "pending", "url": None}
\ No newline at end of file
+from typing import Optional
+
+from utilities.music_generation_utils import get_music_status
+
+async def check_music(jobId: Optional[str] = None):
+    """Endpoint to check if the background music of a game (its musicJobId) is ready"""
+    status, url = get_music_status(jobId)
+    return {"status": status, "url": url}
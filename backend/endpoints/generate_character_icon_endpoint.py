@@ -1,4 +1,5 @@
 import logging
+import os
 from typing import Optional
 
 from fastapi import HTTPException
@@ -10,6 +11,11 @@ from models import PlayerCharacter
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_CHARACTER_ICON_PREFIX = "fantasy art, dungeons and dragons style, detailed, dynamic scene, action shot, "
+_CHARACTER_ICON_SUFFIX = ", vibrant lighting, dramatic composition, high quality, highly detailed"
+# Leave the name out of the icon prompt, so characters with the same race, class and gender share one cached icon
+SHARED_CHARACTER_ICONS = os.environ.get("SHARED_CHARACTER_ICONS", "0") == "1"
+
 class CharacterIconRequest(BaseModel):
     character: PlayerCharacter
 
@@ -28,9 +34,9 @@ async def generate_character_icon(request: CharacterIconRequest):
         raise HTTPException(status_code=500, detail=f"Failed to generate character icon: {str(e)}")
 
 def _create_character_icon_prompt(character: PlayerCharacter):
+    if SHARED_CHARACTER_ICONS:
+        return f"Portrait of a {character.race} {character.characterClass}, {character.gender} in a fantasy D&D style"
     return f"Portrait of a {character.race} {character.characterClass}, {character.gender} named {character.name} in a fantasy D&D style"
 
 async def _generate_character_icon_for_game(prompt: str):
-    enhanced_prompt = f"fantasy art, dungeons and dragons style, detailed, dynamic scene, action shot, {prompt}"
-    enhanced_prompt += ", vibrant lighting, dramatic composition, high quality, highly detailed"
-    return await generate_image(enhanced_prompt)
+    return await generate_image(f"{_CHARACTER_ICON_PREFIX}{prompt}{_CHARACTER_ICON_SUFFIX}")
@@ -8,6 +8,11 @@ from models import Race, CharacterClass
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The enums never change, so list them once instead of on every request
+_RACES: list[Race] = list(Race)
+_CLASSES: list[CharacterClass] = list(CharacterClass)
+_OPTIONS_PER_GAME = 5
+
 class GenerateCharacterOptionsResponse(BaseModel):
     races: list[Race]
     classes: list[CharacterClass]
@@ -18,7 +23,7 @@ async def generate_character_options():
         logger.info("Generating character options")
         
         # Ensure we have Race and CharacterClass defined
-        if not list(Race) or not list(CharacterClass):
+        if not _RACES or not _CLASSES:
             logger.error("Race or CharacterClass enums are empty")
             # Provide defaults if enums are empty
             default_races = ["Human", "Elf", "Dwarf", "Orc", "Halfling"]
@@ -29,12 +34,9 @@ async def generate_character_options():
             }
             
         # Randomly select a subset of races and classes to be available this game
-        available_races = random.sample(list(Race), min(5, len(Race)))
-        available_classes = random.sample(list(CharacterClass), min(5, len(CharacterClass)))
-        
         result = GenerateCharacterOptionsResponse(
-            races = [race.value for race in available_races],
-            classes=[cls.value for cls in available_classes]
+            races=random.sample(_RACES, min(_OPTIONS_PER_GAME, len(_RACES))),
+            classes=random.sample(_CLASSES, min(_OPTIONS_PER_GAME, len(_CLASSES)))
         )
         
         logger.info(f"Generated options: {result}")
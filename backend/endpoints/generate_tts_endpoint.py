@@ -2,9 +2,10 @@ import logging
 import traceback
 from typing import Optional
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from ai.tts_ai_service import generate_tts
+from ai.tts_ai_service import AUDIO_MEDIA_TYPES, TTSAudioFormat, generate_tts, generate_tts_audio, generate_tts_stream
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,15 +14,24 @@ logger = logging.getLogger(__name__)
 class GenerateTTSRequest(BaseModel):
     text: str
     voice: str = "bm_george"  # Default voice
+    stream: bool = False  # Stream WAV audio progressively instead of returning base64 JSON
+    format: TTSAudioFormat = "wav"  # Opus/MP3 are much smaller than WAV, ignored when streaming
 
 class GenerateTTSResponse(BaseModel):
     audioData: Optional[str] = None  # Base64 encoded audio
     
-async def generate_tts_endpoint(request: GenerateTTSRequest):
-    """Generate text-to-speech audio"""
+async def generate_tts_endpoint(request: GenerateTTSRequest, http_request: Request):
+    """Generate text-to-speech audio, as raw audio if the client accepts it or base64 JSON otherwise"""
     try:
         logger.info(f"Generating TTS for text of length: {len(request.text)}")
-        audio_data = await generate_tts(request.text, "bm_george")
+        if request.stream:
+            return StreamingResponse(generate_tts_stream(request.text, "bm_george"), media_type="audio/wav")
+        media_type = AUDIO_MEDIA_TYPES[request.format]
+        if media_type in http_request.headers.get("accept", ""):
+            # Skip the base64 round trip, which also makes the payload a third smaller
+            audio_bytes = await generate_tts_audio(request.text, "bm_george", request.format)
+            return Response(content=bytes(audio_bytes), media_type=media_type)
+        audio_data = await generate_tts(request.text, "bm_george", request.format)
         return GenerateTTSResponse(audioData=audio_data)
     except Exception as e:
         logger.error(f"Error generating TTS: {e}")
@@ -1,20 +1,31 @@
-from typing import List
+import time
+from typing import List, Optional, Tuple
+
+import orjson
 from pydantic import BaseModel
-from ai.text_ai_service import OLLAMA_BASE_URL
+from ai.http_clients import get_ollama_client
+
+MODELS_CACHE_TTL_SECONDS = 60.0
 
 class GetAvailableModelsResponse(BaseModel):
     models: List[str]
+
+# (expires_at, response) of the last successful Ollama lookup
+_models_cache: Optional[Tuple[float, GetAvailableModelsResponse]] = None
     
 async def get_available_models():
-    """Get available models from Ollama"""
+    """Get available models from Ollama, cached for MODELS_CACHE_TTL_SECONDS"""
+    global _models_cache
+    if _models_cache is not None and _models_cache[0] > time.monotonic():
+        return _models_cache[1]
 
-    import httpx
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{OLLAMA_BASE_URL}/tags", timeout=10.0)
-            response.raise_for_status()
-            models = response.json().get("models", [])
-            return GetAvailableModelsResponse(models=[model["name"] for model in models])
+        response = await get_ollama_client().get("/tags", timeout=10.0)
+        response.raise_for_status()
+        models = orjson.loads(response.content).get("models", [])
+        result = GetAvailableModelsResponse(models=[model["name"] for model in models])
+        _models_cache = (time.monotonic() + MODELS_CACHE_TTL_SECONDS, result)
+        return result
     except Exception as e:
-        # Return a default list if Ollama isn't available
-        return GetAvailableModelsResponse(models=["llama3", "mistral", "wizard-mega"])
\ No newline at end of file
+        # Return a default list if Ollama isn't available, not cached so Ollama is retried next time
+        return GetAvailableModelsResponse(models=["llama3", "mistral", "wizard-mega"])
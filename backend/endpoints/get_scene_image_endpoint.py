@@ -0,0 +1,48 @@
+import os
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import RedirectResponse
+from fastapi.staticfiles import StaticFiles
+from utilities.image_job_utils import get_image_job_status, wait_for_image_job, SCENE_IMAGE_DIR
+
+# How long the PNG endpoint holds the request open for an image that is still being generated
+IMAGE_WAIT_TIMEOUT_SECONDS = 120.0
+# Where the app mounts the saved scene images, see create_scene_image_files
+SCENE_IMAGE_URL_PATH = "/static/img"
+SCENE_IMAGE_ROUTE_NAME = "scene-images"
+
+class _ContentAddressedStaticFiles(StaticFiles):
+    """Static files named after the hash of their content, so the file behind a URL never changes and can be cached for good"""
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+def create_scene_image_files() -> StaticFiles:
+    """The static app serving the saved scene images, mounted at SCENE_IMAGE_URL_PATH"""
+    os.makedirs(SCENE_IMAGE_DIR, exist_ok=True)
+    return _ContentAddressedStaticFiles(directory=SCENE_IMAGE_DIR)
+
+async def get_scene_image(job_id: str, request: Request):
+    """Endpoint to check if a scene image generated in the background is ready, and its permanent URL once it is"""
+    status, image_name = await get_image_job_status(job_id)
+    if status == "none":
+        raise HTTPException(status_code=404, detail=f"Unknown image job: {job_id}")
+    return {"status": status, "imageUrl": _make_image_url(request, image_name) if status == "ready" else None}
+
+async def get_scene_image_png(job_id: str, request: Request)-> Response:
+    """
+    Endpoint redirecting to the PNG file of a background generated scene image
+    Lets the client use the URL directly as an <img> source, without the base64 and JSON overhead, the file it redirects to is cached
+    Waits for an image that is still being generated, returns 202 if it isn't ready within IMAGE_WAIT_TIMEOUT_SECONDS
+    """
+    status, image_name = await wait_for_image_job(job_id, IMAGE_WAIT_TIMEOUT_SECONDS)
+    if status == "pending":
+        return Response(status_code=202)
+    if status != "ready":
+        raise HTTPException(status_code=404, detail=f"No image for job: {job_id}")
+    return RedirectResponse(_make_image_url(request, image_name), status_code=307)
+
+def _make_image_url(request: Request, image_name: str)-> str:
+    return str(request.url_for(SCENE_IMAGE_ROUTE_NAME, path=image_name))
@@ -1,17 +1,20 @@
+import asyncio
 import logging
 import traceback
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException
 from pydantic import BaseModel
 
 from ai.text_ai_service import generate_text
 from utilities.tts_generation_utils import maybe_generate_tts
+from utilities.music_generation_utils import start_music_generation
 from utilities.prompt_constants import PromptConstants
 from models import GameSettings, GameState, PlayerCharacter, StoryChapter, StoryScene, StroyArc
-from utilities.image_generation_utils import generate_appropriate_image
+from utilities.image_generation_utils import generate_scene_image
 from utilities.image_context_enum import ImageContextEnum
-from utilities.prompt_utils import generate_fallback_actions, get_dnd_master_description, parse_story_and_actions
+from utilities.request_utils import json_body
+from utilities.prompt_utils import describe_character, describe_party, ensure_story_and_actions, DM_SYSTEM_PROMPT, parse_story_and_actions, strip_quotes
 
 
 logging.basicConfig(level=logging.INFO)
@@ -27,19 +30,25 @@ class NewChapterRequest(BaseModel):
 
 class NewChapterResponse(BaseModel):
     newChapter: StoryChapter
+    # Set when background music is being generated, poll /api/check-music with it, None means there is nothing to poll
+    musicJobId: Optional[str] = None
         
-async def start_new_chapter(request: NewChapterRequest)-> NewChapterResponse:
+async def start_new_chapter(request: NewChapterRequest = Depends(json_body(NewChapterRequest)))-> NewChapterResponse:
     try:
-        is_game_start: bool = len(request.gameState.arcs[-1].chapters) == 0
-        is_arc_start: bool = is_game_start or len(request.gameState.arcs[-1].chapters) == request.gameState.settings.chaptersPerArc
-        next_player_index: int = 0 if is_game_start else request.gameState.arcs[-1].chapters[-1].scenes[-1].activeCharacterIndex
-        next_chapter_index: int = 0 if is_game_start else request.gameState.arcs[-1].chapters[-1].index + 1
+        settings: GameSettings = request.gameState.settings
+        characters: List[PlayerCharacter] = request.gameState.characters
+        current_arc: StroyArc = request.gameState.arcs[-1]
+        chapters: List[StoryChapter] = current_arc.chapters
+        is_game_start: bool = len(chapters) == 0
+        is_arc_start: bool = is_game_start or len(chapters) == settings.chaptersPerArc
+        next_player_index: int = 0 if is_game_start else chapters[-1].scenes[-1].activeCharacterIndex
+        next_chapter_index: int = 0 if is_game_start else chapters[-1].index + 1
         logger.info(f"Starting new chapter is game start: {is_game_start}, is arc start: {is_arc_start}")
         if is_arc_start:
             generated_chapter_title: Optional[str] = None if is_game_start else request.newChapterTitle
-            return await _create_arc_start_chapter(request.gameState.settings, request.gameState.characters, next_player_index, next_chapter_index, generated_chapter_title)
+            return await _create_arc_start_chapter(settings, characters, next_player_index, next_chapter_index, generated_chapter_title)
 
-        return await _create_mid_arc_chapter(request.gameState.settings, request.gameState.arcs[-1], request.gameState.characters, next_player_index, next_chapter_index, request.newChapterTitle)
+        return await _create_mid_arc_chapter(settings, current_arc, characters, next_player_index, next_chapter_index, request.newChapterTitle)
     except Exception as e:
         logger.error(f"Error in start_new_chapter: {e}")
         logger.error(traceback.format_exc())
@@ -52,30 +61,16 @@ async def _create_arc_start_chapter(settings: GameSettings, characters: List[int
         chapter_title = await _create_chapter_title(settings.aiModel, party_description)
  
     initial_story_prompt = _create_initial_story_prompt(characters[next_player_index], party_description, chapter_title)
-    initial_story_text = await generate_text(initial_story_prompt, settings.aiModel)
-    
-    initial_story_part, initial_story_actions = parse_story_and_actions(initial_story_text)
-    
-    if not initial_story_part or len(initial_story_actions) != 3:
-        print(PromptConstants.ACTIONS, len(initial_story_actions), initial_story_text)
-        parts = initial_story_text.split("\n\n")
-        initial_story_part = parts[0]
-        initial_story_actions = generate_fallback_actions(parts)
-    
-    image_base64 = await generate_appropriate_image(
-            settings,
-            ImageContextEnum.CHAPTER_TRANSITION, 
-            initial_story_part,
-            None,
-            chapter_title=chapter_title,
-            party_description=party_description
+    # The opening image only depends on the chapter title and the party, so it is drawn while the story is written
+    (initial_story_part, initial_story_actions, music_job_id, audio_data), (image_base64, image_job_id) = await asyncio.gather(
+        _create_initial_story(settings, initial_story_prompt, characters[next_player_index].name),
+        _create_chapter_image(settings, chapter_title, party_description)
     )
     
-    audio_data = await maybe_generate_tts(initial_story_part, settings.enableAITTS)
-    
     initial_scene = StoryScene(
         text=initial_story_part,
         image=image_base64,
+        imageJobId=image_job_id,
         choices=initial_story_actions,
         audioData=audio_data,
         activeCharacterIndex=next_player_index,
@@ -89,26 +84,46 @@ async def _create_arc_start_chapter(settings: GameSettings, characters: List[int
             summaryImage=None,
             scenes=[initial_scene],
             index=next_chapter_index
-        )
+        ),
+        musicJobId=music_job_id
     )
 
-def _create_party_description(characters: List[PlayerCharacter]):
-    character_descriptions = []
-    for char in characters:
-        character_descriptions.append(f"{char.name} the {char.race} {char.characterClass} ({char.gender})")
+async def _create_initial_story(settings: GameSettings, initial_story_prompt: str, first_character_name: str)-> Tuple[str, List[str], Optional[str], Optional[str]]:
+    """Write the opening scene, then start its music and voice it, returns (story, actions, music_job_id, audio_data)"""
+    initial_story_text = await generate_text(initial_story_prompt, settings.aiModel, system=DM_SYSTEM_PROMPT)
+    
+    initial_story_part, initial_story_actions = ensure_story_and_actions(
+        initial_story_text, *parse_story_and_actions(initial_story_text), character_name=first_character_name
+    )
     
-    party_description = ", ".join(character_descriptions)
-    return party_description
+    # A new arc is a new adventure, so it also gets new background music, generated alongside the scene media
+    music_job_id: Optional[str] = start_music_generation(initial_story_part, settings.enableMusic)
+    audio_data: Optional[str] = await maybe_generate_tts(initial_story_part, settings.enableAITTS)
+    return initial_story_part, initial_story_actions, music_job_id, audio_data
+
+async def _create_chapter_image(settings: GameSettings, chapter_title: str, party_description: str)-> Tuple[Optional[str], Optional[str]]:
+    """The chapter transition image, drawn from the chapter title and the party (the party also stands in for the story if there is no title)"""
+    return await generate_scene_image(
+        settings,
+        ImageContextEnum.CHAPTER_TRANSITION, 
+        party_description,
+        None,
+        chapter_title=chapter_title,
+        party_description=party_description
+    )
+
+def _create_party_description(characters: List[PlayerCharacter]):
+    return describe_party(characters)
 
 async def _create_chapter_title(model: str, party_description: str)-> str:
     chapter_title_prompt: str = _create_chapter_title_prompt(party_description)
-    chapter_title = await generate_text(chapter_title_prompt, model)
-    chapter_title = chapter_title.strip().strip('"').strip("'")
+    chapter_title = await generate_text(chapter_title_prompt, model, system=DM_SYSTEM_PROMPT)
+    chapter_title = strip_quotes(chapter_title)
     return chapter_title
 
 def _create_chapter_title_prompt(party_description: str):
     return f"""
-    {get_dnd_master_description("for a new D&D adventure")}. Create an engaging chapter title for the beginning of an adventure
+    You are starting a new D&D adventure. Create an engaging chapter title for the beginning of an adventure
     with a party consisting of: {party_description}
     
     The title should be short (5-7 words) and evocative. Format your response with just the title, no additional text.
@@ -116,7 +131,7 @@ def _create_chapter_title_prompt(party_description: str):
 
 def _create_initial_story_prompt(first_character: PlayerCharacter, party_description: str, chapter_title: str):
     return f"""
-        {get_dnd_master_description("for a new D&D adventure")}. Create an engaging opening scene for a party consisting of:
+        You are starting a new D&D adventure. Create an engaging opening scene for a party consisting of:
         {party_description}
         
         This is Chapter titled: "{chapter_title}" of the adventure.
@@ -125,7 +140,7 @@ def _create_initial_story_prompt(first_character: PlayerCharacter, party_descrip
         - Provide a vivid description of the initial setting and situation in 2-3 paragraphs only.
         - Introduce an immediate situation that requires action.
         
-        Then, generate exactly 3 possible actions that ONLY the first player ({first_character.name} the {first_character.race} {first_character.characterClass}, {first_character.gender}) could take.
+        Then, generate exactly 3 possible actions that ONLY the first player ({describe_character(first_character)}) could take.
         
         Format your response as follows:
         
@@ -142,28 +157,16 @@ async def _create_mid_arc_chapter(settings: GameSettings, current_arc: StroyArc,
     party_description: str = _create_party_description(characters)
     mid_chapter_prompt: str = _create_mid_arc_new_chapter_prompt(current_arc, party_description, characters[next_player_index], generated_chapter_title)
     logger.info(f"Mid Chapter Prompt: {mid_chapter_prompt}")
-    response_text = await generate_text(mid_chapter_prompt, settings.aiModel)
-    logger.info(f"Mid Chapter Prompt Response: {response_text}")
-    story_part, actions = parse_story_and_actions(response_text)
-    if not story_part or len(actions) != 3:
-        logger.warning(f"New Chapter Actions: {len(actions)}, using fallback")
-        story_part = story_part or (response_text.split("\n\n")[0] if "\n\n" in response_text else response_text)
-        actions = generate_fallback_actions(context="new_chapter")
-
-    image_base64 = await generate_appropriate_image(
-            settings,
-            ImageContextEnum.CHAPTER_TRANSITION, 
-            story_part,
-            None,
-            chapter_title=generated_chapter_title,
-            party_description=party_description
+    # As for the first chapter, the image only depends on the chapter title and the party
+    (story_part, actions, audio_data), (image_base64, image_job_id) = await asyncio.gather(
+        _create_mid_arc_story(settings, mid_chapter_prompt),
+        _create_chapter_image(settings, generated_chapter_title, party_description)
     )
-    
-    audio_data = await maybe_generate_tts(story_part, settings.enableAITTS)
 
     initial_scene = StoryScene(
         text=story_part,
         image=image_base64,
+        imageJobId=image_job_id,
         choices=actions,
         audioData=audio_data,
         activeCharacterIndex=next_player_index,
@@ -178,9 +181,17 @@ async def _create_mid_arc_chapter(settings: GameSettings, current_arc: StroyArc,
         )
     )
 
+async def _create_mid_arc_story(settings: GameSettings, mid_chapter_prompt: str)-> Tuple[str, List[str], Optional[str]]:
+    """Write the chapter's first scene and voice it, returns (story, actions, audio_data)"""
+    response_text = await generate_text(mid_chapter_prompt, settings.aiModel, system=DM_SYSTEM_PROMPT)
+    logger.info(f"Mid Chapter Prompt Response: {response_text}")
+    story_part, actions = ensure_story_and_actions(response_text, *parse_story_and_actions(response_text), context="new_chapter")
+    audio_data: Optional[str] = await maybe_generate_tts(story_part, settings.enableAITTS)
+    return story_part, actions, audio_data
+
 def _create_mid_arc_new_chapter_prompt(current_arc: StroyArc, party_description: str, next_player: PlayerCharacter, generated_chapter_title: str):
      return f"""
-        {get_dnd_master_description("for an ongoing arc and a new chapter of a D&D adventure")} The party is continuing their current adventure in a chapter titled:
+        You are starting a new chapter in an ongoing arc of a D&D adventure. The party is continuing their current adventure in a chapter titled:
         "{generated_chapter_title}"
         
         The party consists of: {party_description}
@@ -1,20 +1,36 @@
+import asyncio
 import logging
+import os
+import re
 import traceback
-from typing import List, Literal, Optional, Union
+from typing import AsyncIterator, List, Literal, Optional, Tuple, Union
 
-from fastapi import HTTPException
+import orjson
+from fastapi import Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from ai.text_ai_service import generate_text
+from ai.text_ai_service import generate_text, generate_text_stream
 from utilities.tts_generation_utils import maybe_generate_tts
-from utilities.image_generation_utils import generate_appropriate_image
+from utilities.image_generation_utils import generate_scene_image, CHAPTER_SUMMARY_USES_SCENE_IMAGE, EARLY_SCENE_IMAGES, STORY_IMAGE_PROMPT_WORDS
 from utilities.image_context_enum import ImageContextEnum
 from utilities.prompt_constants import PromptConstants
-from utilities.prompt_utils import generate_fallback_actions, get_dnd_master_description, parse_story_and_actions
-from models import GameSettings, GameState, PlayerCharacter, StoryChapter, StoryScene, StroyArc
+from utilities.request_utils import json_body
+from utilities.prompt_utils import describe_character, ensure_story_and_actions, extract_chapter_summary, extract_image_prompt, get_chapter_end_json_format, get_story_json_format, DM_SYSTEM_PROMPT, LLM_JSON_OUTPUT, parse_chapter_end_json, parse_story_and_actions, parse_story_json, strip_quotes
+from models import ActionChoice, GameSettings, GameState, PlayerCharacter, StoryChapter, StoryScene, StroyArc
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Scenes kept verbatim in the prompt, older scenes of the chapter are replaced by a rolling summary
+RECENT_SCENES_IN_CONTEXT = 3
+# The summary advances this many scenes at a time, so between steps the context only grows at its end
+# and consecutive prompts share their prefix (which Ollama reuses the KV cache of)
+CONTEXT_SUMMARY_STEP = 3
+# First line after the NEXT CHAPTER marker, found in a single scan instead of splitting the whole response
+_NEXT_CHAPTER_TITLE_RE = re.compile(rf"{re.escape(PromptConstants.NEXT_CHAPTER)}\s*([^\n]*)")
+# Whitespace following the end of a sentence in the streamed story
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
 class ActionRequest(BaseModel):
     gameState: GameState
     customAction: Optional[str] = None  # Add field for custom action text
@@ -24,13 +40,116 @@ class TakeActionResponse(BaseModel):
     nextChapterTitle: Optional[str]
     chapterSummary: Optional[str]
     chapterSummaryImage: Optional[str]
+    chapterSummaryImageJobId: Optional[str] = None  # Set instead of chapterSummaryImage when it is generated in the background
     chapterSummaryAudioData: Optional[str]
+    contextSummary: Optional[str] = None
+    contextSummarySceneCount: int = 0
     
-async def take_action(request: ActionRequest)-> TakeActionResponse:
+async def take_action(request: ActionRequest = Depends(json_body(ActionRequest)))-> TakeActionResponse:
     """Process a player's action and generate the next story segment"""
     game_state: GameState = request.gameState
-    model: str = game_state.settings.aiModel
+    _validate_chosen_action(game_state)
+    scene_image_task: Optional[asyncio.Task] = None
     
+    try:
+        json_output: bool = LLM_JSON_OUTPUT
+        early_scene_image: bool = EARLY_SCENE_IMAGES and game_state.settings.enableImages and not json_output
+        current_chapter, next_player_idx, chapter_story_summary, prompt = await _prepare_story_prompt(game_state, json_output, include_image_prompt=not early_scene_image)
+        # Generate AI response
+        if early_scene_image:
+            next_progression_text, scene_image_task = await _generate_story_with_early_image(game_state.settings, prompt)
+        else:
+            next_progression_text = await generate_text(prompt, game_state.settings.aiModel, system=DM_SYSTEM_PROMPT, json_output=json_output)
+        return await _complete_action(game_state, current_chapter, next_player_idx, chapter_story_summary, next_progression_text, json_output=json_output, scene_image_task=scene_image_task)
+    
+    except Exception as e:
+        logger.error(f"Error in take_action: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to process action: {str(e)}")
+    finally:
+        # Don't leave an orphaned render holding a Stable Diffusion slot
+        if scene_image_task is not None and not scene_image_task.done():
+            scene_image_task.cancel()
+
+async def take_action_stream(request: ActionRequest = Depends(json_body(ActionRequest)))-> StreamingResponse:
+    """
+    Process a player's action, streaming the story as Server-Sent Events while it is generated
+    Emits 'story' events with story text deltas, then a single 'result' event with the full TakeActionResponse
+    A 'story_reset' event with the whole story so far replaces the text sent until then, in case the story turned out to start elsewhere
+    With AI TTS enabled, each finished sentence is voiced while the rest is still generated and sent as an ordered 'tts' event,
+    the scene in the result then has no audioData of its own
+    The scene image is started as soon as the story text it is drawn from is known, while the actions are still generated
+    """
+    game_state: GameState = request.gameState
+    _validate_chosen_action(game_state)
+    stream_tts: bool = game_state.settings.enableAITTS
+    
+    async def event_stream() -> AsyncIterator[str]:
+        tts_tasks: List[asyncio.Task] = []
+        sent_tts_count = 0
+        completion_task: Optional[asyncio.Task] = None
+        scene_image_task: Optional[asyncio.Task] = None
+        try:
+            # The image is drawn from the story instead of an AI written IMAGE PROMPT, which would only arrive after the actions
+            current_chapter, next_player_idx, chapter_story_summary, prompt = await _prepare_story_prompt(game_state, include_image_prompt=False)
+            next_progression_text = ""
+            sent_story = ""
+            spoken_story_length = 0
+            async for fragment in generate_text_stream(prompt, game_state.settings.aiModel, system=DM_SYSTEM_PROMPT):
+                next_progression_text += fragment
+                story_so_far = _extract_streamed_story(next_progression_text)
+                story_event, sent_story, spoken_story_length = _make_story_event(story_so_far, sent_story, spoken_story_length)
+                if story_event is not None:
+                    yield story_event
+                if scene_image_task is None and _has_image_prompt_words(story_so_far):
+                    scene_image_task = _start_scene_image(game_state.settings, story_so_far)
+                if stream_tts:
+                    spoken_story_length = _start_sentence_tts(story_so_far, spoken_story_length, tts_tasks)
+                    while sent_tts_count < len(tts_tasks) and tts_tasks[sent_tts_count].done():
+                        yield _format_tts_event(sent_tts_count, tts_tasks[sent_tts_count].result())
+                        sent_tts_count += 1
+            
+            # The end of the story was held back in case it was the start of a marker
+            story = _extract_streamed_story(next_progression_text, complete=True)
+            story_event, sent_story, spoken_story_length = _make_story_event(story, sent_story, spoken_story_length)
+            if story_event is not None:
+                yield story_event
+            if stream_tts:
+                _start_sentence_tts(story, spoken_story_length, tts_tasks, complete=True)
+            if scene_image_task is None:
+                scene_image_task = _start_scene_image(game_state.settings, story)
+            
+            # Build the scene media while the last sentences are still being voiced
+            completion_task = asyncio.create_task(
+                _complete_action(game_state, current_chapter, next_player_idx, chapter_story_summary, next_progression_text, scene_tts=not stream_tts, scene_image_task=scene_image_task)
+            )
+            for tts_index in range(sent_tts_count, len(tts_tasks)):
+                yield _format_tts_event(tts_index, await tts_tasks[tts_index])
+            response = await completion_task
+            yield _format_sse("result", response.model_dump_json())
+        except Exception as e:
+            logger.error(f"Error in take_action_stream: {e}")
+            logger.error(traceback.format_exc())
+            yield _format_sse("error", _dump_json({"detail": f"Failed to process action: {str(e)}"}))
+        finally:
+            for task in tts_tasks:
+                task.cancel()
+            if completion_task is not None:
+                completion_task.cancel()
+            if scene_image_task is not None:
+                scene_image_task.cancel()
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def _validate_chosen_action(game_state: GameState):
+    """Reject the request before any generation if there is no scene with a chosen action to continue from"""
+    if not game_state.arcs or not game_state.arcs[-1].chapters or not game_state.arcs[-1].chapters[-1].scenes:
+        raise HTTPException(status_code=400, detail="No scene to continue from")
+    if game_state.arcs[-1].chapters[-1].scenes[-1].chosenAction is None:
+        raise HTTPException(status_code=400, detail="No action chosen for the last scene")
+
+async def _prepare_story_prompt(game_state: GameState, json_output: bool = False, include_image_prompt: bool = True)-> Tuple[StoryChapter, int, str, str]:
+    """Work out the next player and build the chapter context and story prompt for the next scene"""
     current_arc: StroyArc = game_state.arcs[-1]
     current_chapter: StoryChapter = current_arc.chapters[-1]
     previous_scene: StoryScene = current_chapter.scenes[-1]
@@ -40,55 +159,216 @@ async def take_action(request: ActionRequest)-> TakeActionResponse:
     next_player_idx: int = (prev_player_index + 1) % len(game_state.characters)
     
     # Build chapter context
-    chapter_story_summary: str = _build_chapter_context(current_chapter, game_state.characters)
+    chapter_story_summary: str = await _build_chapter_context(current_chapter, game_state.characters, game_state.settings.aiModel)
  
     # Create prompt based on chapter state
-    prompt: str = _create_story_prompt(request.gameState.settings, request.gameState.characters, current_arc, current_chapter, chapter_story_summary, next_player_idx)
+    prompt: str = _create_story_prompt(game_state.settings, game_state.characters, current_arc, current_chapter, chapter_story_summary, next_player_idx, json_output, include_image_prompt)
+    return current_chapter, next_player_idx, chapter_story_summary, prompt
+
+async def _complete_action(game_state: GameState, current_chapter: StoryChapter, next_player_idx: int, chapter_story_summary: str, next_progression_text: str, scene_tts: bool = True, json_output: bool = False, scene_image_task: Optional[asyncio.Task] = None)-> TakeActionResponse:
+    """
+    Parse the generated story and build the scene (or chapter ending) around it, scene_tts=False skips voicing the scene
+    scene_image_task is an already started generate_scene_image call, used instead of starting one here
+    """
+    model: str = game_state.settings.aiModel
+    logger.info(f"AI Response (first 20 chars):\n{next_progression_text[:20]}")
     
-    try:
-        # Generate AI response
-        next_progression_text = await generate_text(prompt, model)
-        logger.info(f"AI Response (first 20 chars):\n{next_progression_text[:20]}")
-        
-        next_story_part, next_actions = parse_story_and_actions(next_progression_text)
-        if _is_chapter_ending(len(current_chapter.scenes), game_state.settings.scenesPerChapter):
-            return await _handle_chapter_end(
-                game_state.settings, next_progression_text, model, next_story_part, 
-                next_player_idx,
-                chapter_story_summary
-            )
+    if _is_chapter_ending(len(current_chapter.scenes), game_state.settings.scenesPerChapter):
+        chapter_end_response = parse_chapter_end_json(next_progression_text) if json_output else None
+        if chapter_end_response:
+            next_story_part = chapter_end_response.story.strip()
+            next_chapter_title: str = _clean_chapter_title(chapter_end_response.nextChapterTitle)
+            short_chapter_summary: Optional[str] = chapter_end_response.chapterSummary
         else:
-            if not next_story_part or len(next_actions) < 3:
-                logger.warning(f"Insufficient content parsed from AI response: story={bool(next_story_part)}, actions={len(next_actions)}")
-                next_story_part = next_story_part or next_progression_text
-                next_actions = generate_fallback_actions(game_state.characters[next_player_idx].name)
-            
-            return await _handle_mid_chapter(
+            next_story_part, _ = parse_story_and_actions(next_progression_text)
+            next_chapter_title: str = _extract_chapter_title(next_progression_text)
+            short_chapter_summary: Optional[str] = extract_chapter_summary(next_progression_text)
+        response = await _handle_chapter_end(
+            game_state.settings, next_chapter_title, short_chapter_summary, model, next_story_part, 
+            next_player_idx,
+            chapter_story_summary,
+            scene_tts,
+            scene_image_task
+        )
+    else:
+        story_response = parse_story_json(next_progression_text) if json_output else None
+        if story_response:
+            next_story_part = story_response.story.strip()
+            next_actions = [ActionChoice(id=i, text=action.strip()) for i, action in enumerate(story_response.actions)]
+            image_prompt: Optional[str] = story_response.imagePrompt
+        else:
+            next_story_part, next_actions = parse_story_and_actions(next_progression_text)
+            image_prompt: Optional[str] = extract_image_prompt(next_progression_text)
+        next_story_part, next_actions = ensure_story_and_actions(next_progression_text, next_story_part, next_actions, game_state.characters[next_player_idx].name)
+        
+        # The next turn's context summary only depends on scenes we already have, so update it while the scene media is generated
+        response, _ = await asyncio.gather(
+            _handle_mid_chapter(
                 game_state.settings, next_story_part, next_actions,
-                next_player_idx
-            )
+                next_player_idx,
+                scene_tts,
+                image_prompt,
+                scene_image_task
+            ),
+            _prefetch_context_summary(current_chapter, game_state.characters, model)
+        )
     
-    except Exception as e:
-        logger.error(f"Error in take_action: {e}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Failed to process action: {str(e)}")
+    # Hand the rolling summary back so the client sends it with the next action instead of it being regenerated
+    response.contextSummary = current_chapter.contextSummary
+    response.contextSummarySceneCount = current_chapter.contextSummarySceneCount
+    return response
+
+async def _generate_story_with_early_image(settings: GameSettings, prompt: str)-> Tuple[str, asyncio.Task]:
+    """Generate the response streamed, starting the scene image as soon as the part of the story it is drawn from is known"""
+    next_progression_text = ""
+    scene_image_task: Optional[asyncio.Task] = None
+    try:
+        async for fragment in generate_text_stream(prompt, settings.aiModel, system=DM_SYSTEM_PROMPT):
+            next_progression_text += fragment
+            if scene_image_task is None:
+                story_so_far = _extract_streamed_story(next_progression_text)
+                if _has_image_prompt_words(story_so_far):
+                    scene_image_task = _start_scene_image(settings, story_so_far)
+    except BaseException:
+        if scene_image_task is not None:
+            scene_image_task.cancel()
+        raise
+    if scene_image_task is None:
+        scene_image_task = _start_scene_image(settings, _extract_streamed_story(next_progression_text, complete=True))
+    return next_progression_text, scene_image_task
+
+def _has_image_prompt_words(story_so_far: str)-> bool:
+    """Whether the words the scene image is drawn from are all known, the last streamed word may still be incomplete"""
+    return len(story_so_far.split(None, STORY_IMAGE_PROMPT_WORDS)) > STORY_IMAGE_PROMPT_WORDS
+
+def _start_scene_image(settings: GameSettings, story: str)-> asyncio.Task:
+    """Start illustrating the scene from the beginning of its story, which is all generate_scene_image uses of it"""
+    return asyncio.create_task(generate_scene_image(settings, ImageContextEnum.STORY_UPDATE, story))
+
+def _extract_streamed_story(partial_text: str, complete: bool = False)-> str:
+    """
+    Extract the story section of a partially generated response, or of the whole response once complete
+    Text before the STORY marker (e.g. "Sure! Here is the next part:") isn't story, so nothing is returned until the marker
+    or an end marker shows where the story is, only a complete response without any marker is all story
+    """
+    story_start = partial_text.find(PromptConstants.STORY)
+    story_text = partial_text[story_start + len(PromptConstants.STORY):] if story_start != -1 else partial_text
+    for end_marker in (PromptConstants.ACTIONS, PromptConstants.NEXT_CHAPTER):
+        marker_index = story_text.find(end_marker)
+        if marker_index != -1:
+            return story_text[:marker_index].strip()
+    if complete:
+        return story_text.strip()
+    if story_start == -1:
+        return ""
+    # Hold back the tail, it could be the start of a marker that is still being generated
+    held_back = max(len(PromptConstants.ACTIONS), len(PromptConstants.NEXT_CHAPTER))
+    return story_text[:max(len(story_text) - held_back, 0)].lstrip()
+
+def _make_story_event(story_so_far: str, sent_story: str, spoken_length: int)-> Tuple[Optional[str], str, int]:
+    """
+    The 'story' delta event for the story text not sent yet, or a 'story_reset' event if the story no longer starts with the sent text
+    Returns (event or None, sent story, spoken length), sentences already voiced from the replaced text stay voiced
+    """
+    if story_so_far.startswith(sent_story):
+        if len(story_so_far) == len(sent_story):
+            return None, sent_story, spoken_length
+        return _format_sse("story", _dump_json({"delta": story_so_far[len(sent_story):]})), story_so_far, spoken_length
+    logger.warning("Streamed story start moved, resetting the story sent so far")
+    unchanged_length = len(os.path.commonprefix([story_so_far, sent_story]))
+    return _format_sse("story_reset", _dump_json({"text": story_so_far})), story_so_far, min(spoken_length, unchanged_length)
+
+def _start_sentence_tts(story: str, spoken_length: int, tts_tasks: List[asyncio.Task], complete: bool = False)-> int:
+    """Start voicing the sentences of the story finished since spoken_length, returns the new spoken length"""
+    unspoken_story = story[spoken_length:]
+    sentences = _SENTENCE_END_RE.split(unspoken_story)
+    # The last part is a sentence that is still being generated, unless the story is complete
+    finished_sentences = sentences if complete else sentences[:-1]
+    for sentence in finished_sentences:
+        if sentence.strip():
+            tts_tasks.append(asyncio.create_task(maybe_generate_tts(sentence.strip(), True)))
+    if complete:
+        return len(story)
+    return spoken_length + len(unspoken_story) - len(sentences[-1])
+
+def _format_tts_event(index: int, audio_data: Optional[str])-> str:
+    return _format_sse("tts", _dump_json({"index": index, "audioData": audio_data}))
+
+def _dump_json(data: dict)-> str:
+    # orjson, the tts events carry base64 audio
+    return orjson.dumps(data).decode()
+
+def _format_sse(event: str, data: str)-> str:
+    return f"event: {event}\ndata: {data}\n\n"
 
 def _is_chapter_ending(scenes_in_chapter: int, scenes_per_chapter: int)-> bool:
     """Check if the current chapter is ending"""
     logger.info(f"Chapter length configuration: {scenes_in_chapter}/{scenes_per_chapter} scenes completed")
     return scenes_in_chapter >= scenes_per_chapter
 
-def _build_chapter_context(current_chapter: StoryChapter, characters: List[PlayerCharacter])-> str:
-    """Build narrative context from the current chapter"""
-    chapter_story = ""
+async def _build_chapter_context(current_chapter: StoryChapter, characters: List[PlayerCharacter], model: str)-> str:
+    """
+    Build narrative context from the current chapter
+    Only the last few scenes are included verbatim, older scenes are covered by a rolling summary
+    so the prompt doesn't grow with every turn
+    """
     logger.debug(f"Building chapter context for {current_chapter.scenes}")
-    for scene in current_chapter.scenes:
-        active_character: PlayerCharacter = characters[scene.activeCharacterIndex]
-        chapter_story += f"{scene.text}\n"
-        chapter_story += f"Then {active_character.name} the {active_character.race} {active_character.characterClass} ({active_character.gender}) chose to: {scene.chosenAction}\n"
-    return chapter_story
+    summarized_scene_count: int = _get_summarized_scene_count(len(current_chapter.scenes))
+    recent_story: str = _describe_scenes(current_chapter.scenes[summarized_scene_count:], characters)
+    if summarized_scene_count == 0:
+        return recent_story
+    
+    if not current_chapter.contextSummary or current_chapter.contextSummarySceneCount != summarized_scene_count:
+        await _update_context_summary(current_chapter, characters, summarized_scene_count, model)
+    return f"Summary so far: {current_chapter.contextSummary}\n\nRecent scenes:\n{recent_story}"
+
+def _describe_scenes(scenes: List[StoryScene], characters: List[PlayerCharacter])-> str:
+    return "".join(
+        f"{scene.text}\nThen {describe_character(characters[scene.activeCharacterIndex])} chose to: {scene.chosenAction}\n"
+        for scene in scenes
+    )
+
+def _get_summarized_scene_count(scene_count: int)-> int:
+    """Number of scenes covered by the summary, keeping between RECENT_SCENES_IN_CONTEXT and RECENT_SCENES_IN_CONTEXT + CONTEXT_SUMMARY_STEP - 1 scenes verbatim"""
+    return max((scene_count - RECENT_SCENES_IN_CONTEXT) // CONTEXT_SUMMARY_STEP * CONTEXT_SUMMARY_STEP, 0)
+
+async def _update_context_summary(current_chapter: StoryChapter, characters: List[PlayerCharacter], summarized_scene_count: int, model: str):
+    """Extend the chapter's rolling summary to cover its first summarized_scene_count scenes"""
+    previous_summary: Optional[str] = current_chapter.contextSummary
+    covered_scene_count: int = current_chapter.contextSummarySceneCount
+    if not previous_summary or covered_scene_count > summarized_scene_count:
+        previous_summary, covered_scene_count = None, 0
+    
+    new_scenes: str = _describe_scenes(current_chapter.scenes[covered_scene_count:summarized_scene_count], characters)
+    logger.info(f"Summarizing scenes {covered_scene_count + 1}-{summarized_scene_count} of the chapter")
+    summary: str = await generate_text(_generate_context_summary_prompt(previous_summary, new_scenes), model)
+    current_chapter.contextSummary = summary.strip()
+    current_chapter.contextSummarySceneCount = summarized_scene_count
 
-def _create_story_prompt(settings: GameSettings, characters: List[PlayerCharacter], current_arc: StroyArc, current_chapter: StoryChapter, chapter_story_summary: str, next_player_index: int):
+async def _prefetch_context_summary(current_chapter: StoryChapter, characters: List[PlayerCharacter], model: str):
+    """Update the rolling summary to what the next turn's context needs, once the new scene is added"""
+    summarized_scene_count: int = _get_summarized_scene_count(len(current_chapter.scenes) + 1)
+    if summarized_scene_count <= 0 or current_chapter.contextSummarySceneCount == summarized_scene_count:
+        return
+    try:
+        await _update_context_summary(current_chapter, characters, summarized_scene_count, model)
+    except Exception as e:
+        # Not fatal, the next turn summarizes the scenes itself
+        logger.error(f"Failed to update the context summary: {e}")
+
+def _generate_context_summary_prompt(previous_summary: Optional[str], new_scenes: str)-> str:
+    previous_summary_text: str = f"Summary of the earlier scenes: {previous_summary}" if previous_summary else ""
+    return f"""
+    Summarize the following scenes of a D&D adventure chapter in 4 sentences.
+    Keep the characters' choices and any unresolved threads.
+    
+    {previous_summary_text}
+    {new_scenes}
+    
+    Just provide the summary text without any additional formatting or text.
+    """
+
+def _create_story_prompt(settings: GameSettings, characters: List[PlayerCharacter], current_arc: StroyArc, current_chapter: StoryChapter, chapter_story_summary: str, next_player_index: int, json_output: bool = False, include_image_prompt: bool = True):
     """Create the appropriate prompt based on chapter state"""
     should_generate_end_chapter: bool = _is_chapter_ending(len(current_chapter.scenes), settings.scenesPerChapter)
     previous_player_index: int = current_chapter.scenes[-1].activeCharacterIndex
@@ -96,52 +376,68 @@ def _create_story_prompt(settings: GameSettings, characters: List[PlayerCharacte
     next_player: PlayerCharacter = characters[next_player_index]
     chosen_action: str = current_chapter.scenes[-1].chosenAction
     if not should_generate_end_chapter:
-        return _generate_mid_chapter_prompt(chapter_story_summary, len(current_chapter.scenes), settings.scenesPerChapter, previous_player, chosen_action, next_player)
+        return _generate_mid_chapter_prompt(chapter_story_summary, len(current_chapter.scenes), settings.scenesPerChapter, previous_player, chosen_action, next_player, settings.enableImages and include_image_prompt, json_output)
     
     is_arc_ending: bool = len(current_arc.chapters) >= settings.chaptersPerArc
     logger.info(f"is Arc ending: {is_arc_ending}")
     if is_arc_ending:
-        return _generate_arc_end_prompt(chapter_story_summary, previous_player, chosen_action)
+        return _generate_arc_end_prompt(chapter_story_summary, previous_player, chosen_action, json_output)
     else:
-        return _generate_chapter_end_prompt(chapter_story_summary, previous_player, chosen_action)
+        return _generate_chapter_end_prompt(chapter_story_summary, previous_player, chosen_action, json_output)
 
-def _generate_mid_chapter_prompt(chapter_story_summary: str, current_chapter_scene: int, scenes_per_chapter: int, previous_player: PlayerCharacter, chosen_action: str, next_player: PlayerCharacter)-> str:
-    return f"""
-        {get_dnd_master_description("for an ongoing D&D adventure")}. Continue the story based on the player's choice.
+def _generate_mid_chapter_prompt(chapter_story_summary: str, current_chapter_scene: int, scenes_per_chapter: int, previous_player: PlayerCharacter, chosen_action: str, next_player: PlayerCharacter, include_image_prompt: bool = False, json_output: bool = False)-> str:
+    # Static instructions first and the turn-specific story last, so consecutive turns share the longest possible prompt prefix
+    # With images enabled, the scene illustration prompt is written in the same call instead of being derived from the story
+    image_prompt_format: str = f"""
         
-        Story so far this chapter:
-        {chapter_story_summary}
+        {PromptConstants.IMAGE_PROMPT}
+        [One line describing the scene visually for an illustration, no character names]""" if include_image_prompt else ""
+    response_format: str = get_story_json_format(include_image_prompt) if json_output else f"""Format your response as follows:
+        
+        {PromptConstants.STORY}
+        [Your brief continuation here, 1 paragraph only]
+        
+        {PromptConstants.ACTIONS}
+        1. [First action choice for the next player ONLY]
+        2. [Second action choice for the next player ONLY]
+        3. [Third action choice for the next player ONLY]{image_prompt_format}"""
+    return f"""
+        You are continuing an ongoing D&D adventure. Continue the story based on the player's choice.
         
-        Previous player {previous_player.name} (a {previous_player.race} {previous_player.characterClass}, {previous_player.gender}) chose to: {chosen_action}
-        The scene of the story that you need to generate is scene {current_chapter_scene}/{scenes_per_chapter}.
-
         IMPORTANT INSTRUCTIONS:
         - Continue the story in a BRIEF, action-oriented way - 1 paragraph ONLY.
         - Focus on immediate consequences and move the story forward quickly.
         - Avoid lengthy descriptions or background information.
         - Depending on the progress of the chapter, you may need to wrap up the chapter soon.
+        - Then provide exactly 3 possible actions for the NEXT PLAYER ONLY.
         
-        Then provide exactly 3 possible actions for NEXT PLAYER ONLY: {next_player.name} (a {next_player.race} {next_player.characterClass}, {next_player.gender}).
+        {response_format}
         
-        Format your response as follows:
+        Story so far this chapter:
+        {chapter_story_summary}
         
-        {PromptConstants.STORY}
-        [Your brief continuation here, 1 paragraph only]
+        Previous player {describe_character(previous_player)} chose to: {chosen_action}
+        The scene of the story that you need to generate is scene {current_chapter_scene}/{scenes_per_chapter}.
         
-        {PromptConstants.ACTIONS}
-        1. [First action choice for {next_player.name} ONLY]
-        2. [Second action choice for {next_player.name} ONLY]
-        3. [Third action choice for {next_player.name} ONLY]
+        The NEXT PLAYER is: {describe_character(next_player)}.
         """
 
-def _generate_arc_end_prompt(chapter_story_so_far: str, previous_player: int, chosen_action: str)-> str:
-    return f"""
-        {get_dnd_master_description("for an ongoing D&D adventure")}. This chapter is the final chapter in a story arc.
+def _generate_arc_end_prompt(chapter_story_so_far: str, previous_player: PlayerCharacter, chosen_action: str, json_output: bool = False)-> str:
+    response_format: str = get_chapter_end_json_format(
+        "your conclusive chapter ending, 1-2 paragraphs",
+        "new chapter title for a fresh adventure - short and evocative"
+    ) if json_output else f"""Format your response as follows:
         
-        Story this chapter:
-        {chapter_story_so_far}
+        {PromptConstants.STORY}
+        [Your conclusive chapter ending here, 1-2 paragraphs]
         
-        Current player {previous_player.name} (a {previous_player.race} {previous_player.characterClass}, {previous_player.gender}) chose to: {chosen_action}
+        {PromptConstants.NEXT_CHAPTER}
+        [New chapter title for a fresh adventure - short and evocative]
+        
+        {PromptConstants.CHAPTER_SUMMARY}
+        [Concise summary of the whole chapter, 1-2 sentences]"""
+    return f"""
+        You are continuing an ongoing D&D adventure. This chapter is the final chapter in a story arc.
         
         IMPORTANT CYCLE END INSTRUCTIONS:
         - This is the FINAL CHAPTER in the current story arc, so write a CONCLUSIVE ending.
@@ -149,76 +445,84 @@ def _generate_arc_end_prompt(chapter_story_so_far: str, previous_player: int, ch
         - Give the adventure a sense of closure and accomplishment.
         - Write a satisfying conclusion in 1-2 paragraphs only.
         - Then create a title for the next chapter that hints at a completely NEW adventure.
+        - Finally summarize the whole chapter, including your ending, in 1-2 sentences.
         
-        Format your response as follows:
+        {response_format}
         
-        {PromptConstants.STORY}
-        [Your conclusive chapter ending here, 1-2 paragraphs]
+        Story this chapter:
+        {chapter_story_so_far}
         
-        {PromptConstants.NEXT_CHAPTER}
-        [New chapter title for a fresh adventure - short and evocative]
+        Current player {describe_character(previous_player)} chose to: {chosen_action}
         """
 
-def _generate_chapter_end_prompt(chapter_story_so_far: str, previous_player: int, chosen_action: str)-> str:
-    return f"""
-        {get_dnd_master_description("for an ongoing D&D adventure")}. The current chapter is ending, but the story arc continues.
+def _generate_chapter_end_prompt(chapter_story_so_far: str, previous_player: PlayerCharacter, chosen_action: str, json_output: bool = False)-> str:
+    response_format: str = get_chapter_end_json_format(
+        "your chapter conclusion with unresolved elements, 1-2 paragraphs",
+        "new chapter title that continues this storyline - short and evocative"
+    ) if json_output else f"""Format your response as follows:
         
-        Story this chapter:
-        {chapter_story_so_far}
+        {PromptConstants.STORY}
+        [Your chapter conclusion here with unresolved elements, 1-2 paragraphs]
+        
+        {PromptConstants.NEXT_CHAPTER}
+        [New chapter title that continues this storyline - short and evocative]
         
-        Current player {previous_player.name} (a {previous_player.race} {previous_player.characterClass}, {previous_player.gender}) chose to: {chosen_action}
+        {PromptConstants.CHAPTER_SUMMARY}
+        [Concise summary of the whole chapter, 1-2 sentences]"""
+    return f"""
+        You are continuing an ongoing D&D adventure. The current chapter is ending, but the story arc continues.
         
         IMPORTANT INSTRUCTIONS:
         - Write a BRIEF, chapter conclusion in 1-2 paragraphs only.
-        - Focus on resolving the immediate situation based on {previous_player.name}'s action.
+        - Focus on resolving the immediate situation based on the current player's action.
         - However, leave some unresolved elements for the next chapter to pick up.
         - Create a sense of "to be continued" rather than a complete ending.
         - Then create a title for the next chapter that hints at continuing this storyline.
+        - Finally summarize the whole chapter, including your ending, in 1-2 sentences.
         
-        Format your response as follows:
+        {response_format}
         
-        {PromptConstants.STORY}
-        [Your chapter conclusion here with unresolved elements, 1-2 paragraphs]
+        Story this chapter:
+        {chapter_story_so_far}
         
-        {PromptConstants.NEXT_CHAPTER}
-        [New chapter title that continues this storyline - short and evocative]
+        Current player {describe_character(previous_player)} chose to: {chosen_action}
         """
     
 async def _handle_chapter_end(
         settings: GameSettings, 
-        next_progression_text: str,
+        next_chapter_title: str,
+        short_chapter_summary: Optional[str],
         model: str, 
         next_story_part: str, 
         next_player_index: int, 
-        chapter_story_summary: str
+        chapter_story_summary: str,
+        scene_tts: bool = True,
+        scene_image_task: Optional[asyncio.Task] = None
     ):
-    next_chapter_title: str = _extract_chapter_title(next_progression_text)
-    
-    short_summary_prompt: str = _generate_chapter_summary_prompt(chapter_story_summary, next_story_part)
-    short_chapter_summary: str = await generate_text(short_summary_prompt, model)
-    short_chapter_summary: str = short_chapter_summary.strip().strip('"').strip("'")
-    chapter_summary_audio_data: Optional[str] = await maybe_generate_tts(short_chapter_summary, settings.enableAITTS)
-    chapter_summary_image = await generate_appropriate_image(
-        settings, 
-        ImageContextEnum.CHAPTER_SUMMARY, 
-        short_chapter_summary
-    )
-    
-    image_base64 = await generate_appropriate_image(
-        settings, 
-        ImageContextEnum.STORY_UPDATE, 
-        next_story_part
+    # The chapter summary and the scene media don't depend on each other, so generate them concurrently
+    chapter_summary_result, (image_base64, image_job_id), next_scene_audio_data = await asyncio.gather(
+        _generate_chapter_summary(settings, model, chapter_story_summary, next_story_part, short_chapter_summary, with_image=not CHAPTER_SUMMARY_USES_SCENE_IMAGE),
+        scene_image_task or generate_scene_image(
+            settings, 
+            ImageContextEnum.STORY_UPDATE, 
+            next_story_part
+        ),
+        maybe_generate_tts(next_story_part, settings.enableAITTS and scene_tts)
     )
-    next_scene_audio_data: Optional[str] = await maybe_generate_tts(next_story_part, settings.enableAITTS)
+    short_chapter_summary, chapter_summary_audio_data, (chapter_summary_image, chapter_summary_image_job_id) = chapter_summary_result
+    if CHAPTER_SUMMARY_USES_SCENE_IMAGE:
+        chapter_summary_image, chapter_summary_image_job_id = image_base64, image_job_id
     
     response = TakeActionResponse(
         nextChapterTitle=next_chapter_title,
         chapterSummary=short_chapter_summary,
         chapterSummaryImage=chapter_summary_image,
+        chapterSummaryImageJobId=chapter_summary_image_job_id,
         chapterSummaryAudioData=chapter_summary_audio_data,
         scene=StoryScene(
             text=next_story_part,
             image=image_base64,
+            imageJobId=image_job_id,
             activeCharacterIndex=next_player_index,
             chosenAction=None,
             audioData=next_scene_audio_data,
@@ -227,6 +531,23 @@ async def _handle_chapter_end(
     )
     return response
 
+async def _generate_chapter_summary(settings: GameSettings, model: str, chapter_story_summary: str, next_story_part: str, short_chapter_summary: Optional[str] = None, with_image: bool = True)-> Tuple[str, Optional[str], Tuple[Optional[str], Optional[str]]]:
+    """Generate the chapter summary text unless the chapter ending already came with one, then its audio and (with_image) image concurrently"""
+    if not short_chapter_summary:
+        logger.info("No chapter summary in the chapter ending, generating one")
+        short_summary_prompt: str = _generate_chapter_summary_prompt(chapter_story_summary, next_story_part)
+        short_chapter_summary: str = await generate_text(short_summary_prompt, model)
+        short_chapter_summary: str = strip_quotes(short_chapter_summary)
+    chapter_summary_audio_data, chapter_summary_image = await asyncio.gather(
+        maybe_generate_tts(short_chapter_summary, settings.enableAITTS),
+        generate_scene_image(
+            settings, 
+            ImageContextEnum.CHAPTER_SUMMARY, 
+            short_chapter_summary
+        ) if with_image else asyncio.sleep(0, result=(None, None))
+    )
+    return short_chapter_summary, chapter_summary_audio_data, chapter_summary_image
+
 def _generate_chapter_summary_prompt(chapter_story: str, story_part: str)-> str:
     return f"""
     Create a concise summary (1-2 sentences) of the following chapter in a D&D adventure:
@@ -240,20 +561,14 @@ def _generate_chapter_summary_prompt(chapter_story: str, story_part: str)-> str:
 def _extract_chapter_title(response_text)-> Union[str, Literal["The Next Chapter"]]:
     """Extract chapter title from AI response"""
     next_chapter_title: str = "The Next Chapter"
-    if PromptConstants.NEXT_CHAPTER in response_text:
-        next_chapter_title = response_text.split(PromptConstants.NEXT_CHAPTER)[1].strip()
-        # Improved title cleaning
-        next_chapter_title = next_chapter_title.split("\n")[0].strip()
-        next_chapter_title = next_chapter_title.strip('"').strip("'")
-        # Limit title length to avoid story content in title
-        if len(next_chapter_title) > 50:  # Reasonable max length for a title
-            next_chapter_title = next_chapter_title[:50].strip()
+    if (title_match := _NEXT_CHAPTER_TITLE_RE.search(response_text)):
+        next_chapter_title = _clean_chapter_title(title_match.group(1))
     else:
-        # Fallback parsing
-        parts: str = response_text.split("\n\n")
-        if len(parts) > 1:
+        # Fallback parsing, the last paragraph
+        _, paragraph_separator, last_paragraph = response_text.rpartition("\n\n")
+        if paragraph_separator:
             # Use a more conservative approach for title extraction
-            potential_title = parts[-1].strip().strip('"').strip("'")
+            potential_title = strip_quotes(last_paragraph)
             # If the potential title is too long, it's likely part of the story
             if len(potential_title) <= 50:
                 next_chapter_title = potential_title
@@ -264,21 +579,31 @@ def _extract_chapter_title(response_text)-> Union[str, Literal["The Next Chapter
     
     return next_chapter_title
 
-async def _handle_mid_chapter(settings: GameSettings, story_part: str, actions: List[str], next_player_index: int):
-    """Handle mid-chapter story continuation"""
+def _clean_chapter_title(title: str)-> str:
+    """Strip quotes from a generated chapter title and keep it to a reasonable length"""
+    title = strip_quotes(title)
+    # Limit title length to avoid story content in title
+    if len(title) > 50:  # Reasonable max length for a title
+        title = title[:50].strip()
+    return title if len(title) >= 3 else "The Next Chapter"
+
+async def _handle_mid_chapter(settings: GameSettings, story_part: str, actions: List[str], next_player_index: int, scene_tts: bool = True, image_prompt: Optional[str] = None, scene_image_task: Optional[asyncio.Task] = None):
+    """Handle mid-chapter story continuation, illustrated from image_prompt when the AI wrote one"""
 
-    image_base64 = await generate_appropriate_image(
-        settings, 
-        ImageContextEnum.STORY_UPDATE, 
-        story_part
+    (image_base64, image_job_id), audio_data = await asyncio.gather(
+        scene_image_task or generate_scene_image(
+            settings, 
+            ImageContextEnum.STORY_UPDATE, 
+            image_prompt or story_part
+        ),
+        maybe_generate_tts(story_part, settings.enableAITTS and scene_tts)
     )
     
-    audio_data = await maybe_generate_tts(story_part, settings.enableAITTS)
-    
     response = TakeActionResponse(
         scene=StoryScene(
             text=story_part,
             image=image_base64,
+            imageJobId=image_job_id,
             activeCharacterIndex=next_player_index,
             chosenAction=None,
             audioData=audio_data,
@@ -46,6 +46,7 @@ class ActionChoice(BaseModel):
 class StoryScene(BaseModel):
     text: str
     image: Optional[str] = None
+    imageJobId: Optional[str] = None  # Set instead of image when the image is still being generated in the background
     audioData: Optional[str] = None
     choices: List[ActionChoice] = Field(default_factory=list)
     activeCharacterIndex: Optional[int] = None
@@ -58,6 +59,8 @@ class StoryChapter(BaseModel):
     summaryAudioData: Optional[str] = None
     scenes: List[StoryScene]
     index: int
+    contextSummary: Optional[str] = None  # Rolling summary of the older scenes, used instead of their full text in prompts
+    contextSummarySceneCount: int = 0  # Number of scenes (from the chapter start) covered by contextSummary
 
 class StroyArc(BaseModel):
     chapters: List[StoryChapter]
@@ -1,12 +1,42 @@
 import logging
-from typing import Optional
+import os
+from typing import Optional, Tuple
 from ai.image_ai_service import generate_image
 from models import GameSettings
 from utilities.image_context_enum import ImageContextEnum
+from utilities.image_job_utils import start_image_job
+from utilities.prompt_utils import make_visual_prompt
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_CHAPTER_TRANSITION_PREFIX = "fantasy art, dungeons and dragons style, detailed, story transition, narrative continuity, same characters in new situation, "
+_CHAPTER_TRANSITION_SUFFIX = ", detailed background, dramatic lighting, seamless storytelling, character consistency"
+_GENERIC_STORY_PREFIX = "fantasy art, dungeons and dragons style, detailed, dynamic scene, action shot, "
+_GENERIC_STORY_SUFFIX = ", vibrant lighting, dramatic composition, high quality, highly detailed"
+
+# Return scenes without waiting for Stable Diffusion and without the inline base64 image, the client loads it from /api/scene-image/{imageJobId}/png
+ASYNC_SCENE_IMAGES = os.environ.get("ASYNC_SCENE_IMAGES", "0") == "1"
+# Story scenes are illustrated from their first words, so the image can be started once this many of them are known
+STORY_IMAGE_PROMPT_WORDS = 35
+# Words of the new chapter's story added to a chapter transition image prompt
+TRANSITION_STORY_PROMPT_WORDS = 16
+# Start scene images while the rest of the response is generated, instead of illustrating them from an AI written IMAGE PROMPT
+# The response is then streamed from Ollama, which skips the semantic cache and the sharing of identical running requests
+EARLY_SCENE_IMAGES = os.environ.get("EARLY_SCENE_IMAGES", "0") == "1"
+# Show the chapter ending's scene image with the chapter summary, instead of rendering a second image for it
+CHAPTER_SUMMARY_USES_SCENE_IMAGE = os.environ.get("CHAPTER_SUMMARY_USES_SCENE_IMAGE", "0") == "1"
+
+async def generate_scene_image(settings: GameSettings, context: ImageContextEnum, story_text: str, chapter_summary: Optional[str]=None, chapter_title: Optional[str]=None, party_description: Optional[str]=None)-> Tuple[Optional[str], Optional[str]]:
+    """Generate the image of a scene (or chapter summary), returns (image, image_job_id), only one of which is set when ASYNC_SCENE_IMAGES is enabled"""
+    if not settings.enableImages:
+        return None, None
+    
+    image_coroutine = generate_appropriate_image(settings, context, story_text, chapter_summary, chapter_title, party_description)
+    if ASYNC_SCENE_IMAGES:
+        return None, start_image_job(image_coroutine)
+    return await image_coroutine, None
+
 async def generate_appropriate_image(settings: GameSettings, context: ImageContextEnum, story_text: str, chapter_summary: Optional[str]=None, chapter_title: Optional[str]=None, party_description: Optional[str]=None):
     """Generate an appropriate image based on context and available information"""
     if not settings.enableImages:
@@ -17,7 +47,7 @@ async def generate_appropriate_image(settings: GameSettings, context: ImageConte
         
         if context == ImageContextEnum.CHAPTER_TRANSITION and chapter_summary and chapter_title:
             # Transition between chapters
-            image_prompt = f"Fantasy D&D scene showing transition: {chapter_summary} → {chapter_title} - {story_text[:100]}"
+            image_prompt = f"Fantasy D&D scene showing transition: {chapter_summary} → {chapter_title} - {make_visual_prompt(story_text, TRANSITION_STORY_PROMPT_WORDS)}"
             image_prompt = _create_enhanced_image_prompt_for_chapter_transition(image_prompt)
         elif context == ImageContextEnum.CHAPTER_TRANSITION and chapter_title and party_description:
             # New chapter without previous summary
@@ -28,7 +58,7 @@ async def generate_appropriate_image(settings: GameSettings, context: ImageConte
             image_prompt = _create_enhanced_image_prompt_for_generic_story(image_prompt)
         else:
             # Generic story illustration
-            image_prompt = story_text[:200]
+            image_prompt = make_visual_prompt(story_text, STORY_IMAGE_PROMPT_WORDS)
             image_prompt = _create_enhanced_image_prompt_for_generic_story(image_prompt)
             
         logger.info(f"Generating image with context '{context}' and prompt: {image_prompt[:50]}...")
@@ -38,11 +68,7 @@ async def generate_appropriate_image(settings: GameSettings, context: ImageConte
         return None
     
 def _create_enhanced_image_prompt_for_chapter_transition(prompt: str):
-    enhanced_prompt = f"fantasy art, dungeons and dragons style, detailed, story transition, narrative continuity, same characters in new situation, {prompt}"
-    enhanced_prompt += ", detailed background, dramatic lighting, seamless storytelling, character consistency"
-    return enhanced_prompt
+    return f"{_CHAPTER_TRANSITION_PREFIX}{prompt}{_CHAPTER_TRANSITION_SUFFIX}"
 
 def _create_enhanced_image_prompt_for_generic_story(prompt: str):
-    enhanced_prompt = f"fantasy art, dungeons and dragons style, detailed, dynamic scene, action shot, {prompt}"
-    enhanced_prompt += ", vibrant lighting, dramatic composition, high quality, highly detailed"
-    return enhanced_prompt
\ No newline at end of file
+    return f"{_GENERIC_STORY_PREFIX}{prompt}{_GENERIC_STORY_SUFFIX}"
\ No newline at end of file
@@ -0,0 +1,110 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import re
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Optional, Tuple
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Scene images generated in the background, polled through /api/scene-image/{job_id} like music is through /api/check-music
+MAX_IMAGE_JOBS = 256
+_image_jobs: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+# Finished images are saved as {sha1}.png, and each job's image name is saved in a file named after the job
+# The scenes pointing to them keep their images once the job has left the table, after a restart and across API_WORKERS
+SCENE_IMAGE_DIR = os.environ.get("SCENE_IMAGE_DIR", "data/scene_images")
+SCENE_IMAGE_JOB_DIR = os.environ.get("SCENE_IMAGE_JOB_DIR", "data/scene_image_jobs")
+_JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+_IMAGE_NAME_RE = re.compile(r"[0-9a-f]{40}\.png")
+
+def start_image_job(image_coroutine: Awaitable[Optional[str]]) -> str:
+    """Run an image generation in the background and return the id to poll it with"""
+    job_id = uuid.uuid4().hex
+    _image_jobs[job_id] = asyncio.create_task(_generate_image_safely(job_id, image_coroutine))
+    _drop_finished_jobs()
+    logger.info(f"Started image job {job_id}")
+    return job_id
+
+async def get_image_job_status(job_id: str) -> Tuple[str, Optional[str]]:
+    """Return the status of an image job and the file name of its image once ready"""
+    task = _image_jobs.get(job_id)
+    if task is None:
+        image_name = await asyncio.to_thread(_read_job_image_name, job_id)
+        return ("ready", image_name) if image_name is not None else ("none", None)
+    if not task.done():
+        return "pending", None
+    if task.cancelled() or task.result() is None:
+        return "failed", None
+    return "ready", task.result()
+
+async def wait_for_image_job(job_id: str, timeout: float) -> Tuple[str, Optional[str]]:
+    """Wait up to timeout seconds for a pending image job, then return its status like get_image_job_status"""
+    task = _image_jobs.get(job_id)
+    if task is not None and not task.done():
+        # Shielded, a client giving up on the request mustn't cancel the job
+        await asyncio.wait([asyncio.shield(task)], timeout=timeout)
+    return await get_image_job_status(job_id)
+
+async def read_scene_image(image_name: str) -> Optional[bytes]:
+    """The PNG bytes of a saved scene image, None if it doesn't exist"""
+    return await asyncio.to_thread(_read_scene_image, image_name)
+
+def _drop_finished_jobs():
+    # Finished images are on disk, so only finished jobs leave the table and running ones are never cancelled
+    excess = len(_image_jobs) - MAX_IMAGE_JOBS
+    if excess <= 0:
+        return
+    for job_id in [job_id for job_id, task in _image_jobs.items() if task.done()][:excess]:
+        del _image_jobs[job_id]
+
+async def _generate_image_safely(job_id: str, image_coroutine: Awaitable[Optional[str]]) -> Optional[str]:
+    try:
+        image = await image_coroutine
+        if image is None:
+            return None
+        return await asyncio.to_thread(_save_scene_image, job_id, image)
+    except Exception as e:
+        logger.error(f"Failed to generate image: {e}")
+        return None
+
+def _save_scene_image(job_id: str, image: str) -> str:
+    png = base64.b64decode(image)
+    image_name = f"{hashlib.sha1(png).hexdigest()}.png"
+    os.makedirs(SCENE_IMAGE_DIR, exist_ok=True)
+    os.makedirs(SCENE_IMAGE_JOB_DIR, exist_ok=True)
+    image_path = os.path.join(SCENE_IMAGE_DIR, image_name)
+    if not os.path.exists(image_path):
+        _write_atomically(image_path, png)
+    _write_atomically(os.path.join(SCENE_IMAGE_JOB_DIR, job_id), image_name.encode("ascii"))
+    return image_name
+
+def _write_atomically(path: str, data: bytes):
+    # Another worker may read the file while it is written
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def _read_job_image_name(job_id: str) -> Optional[str]:
+    if not _JOB_ID_RE.fullmatch(job_id):
+        return None
+    try:
+        with open(os.path.join(SCENE_IMAGE_JOB_DIR, job_id), "r", encoding="ascii") as f:
+            image_name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return image_name if _IMAGE_NAME_RE.fullmatch(image_name) else None
+
+def _read_scene_image(image_name: str) -> Optional[bytes]:
+    if not _IMAGE_NAME_RE.fullmatch(image_name):
+        return None
+    try:
+        with open(os.path.join(SCENE_IMAGE_DIR, image_name), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
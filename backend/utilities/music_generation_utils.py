@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+from ai.music_ai_service import generate_music
+from utilities.prompt_utils import make_visual_prompt
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Music generation takes minutes, so it runs in the background and is polled through /api/check-music?jobId=...
+# One job per started arc, so concurrent games don't replace each other's music
+MAX_MUSIC_JOBS = 64
+_music_jobs: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+# The music is composed from the first words of the arc's opening scene
+MUSIC_PROMPT_WORDS = 16
+
+def start_music_generation(text: str, enable_music=False) -> Optional[str]:
+    """Start generating background music for text if enabled, returns the job id to poll or None when there is nothing to poll"""
+    if not enable_music or not text:
+        return None
+    
+    job_id = uuid.uuid4().hex
+    logger.info(f"Starting music job {job_id} for text of length {len(text)}")
+    _music_jobs[job_id] = asyncio.create_task(_generate_music_safely(make_visual_prompt(text, MUSIC_PROMPT_WORDS)))
+    while len(_music_jobs) > MAX_MUSIC_JOBS:
+        _, oldest_task = _music_jobs.popitem(last=False)
+        oldest_task.cancel()
+    return job_id
+
+def get_music_status(job_id: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """Return the status of a music job (the latest one if no id is given) and its URL once ready"""
+    if job_id is None:
+        job_id = next(reversed(_music_jobs), None)
+    task = _music_jobs.get(job_id) if job_id is not None else None
+    if task is None:
+        return "none", None
+    if not task.done():
+        return "pending", None
+    if task.cancelled() or task.result() is None:
+        return "failed", None
+    return "ready", task.result()
+
+async def _generate_music_safely(prompt: str) -> Optional[str]:
+    try:
+        return await generate_music(prompt)
+    except Exception as e:
+        logger.error(f"Failed to generate music: {e}")
+        return None
@@ -1,4 +1,6 @@
 class PromptConstants:
     NEXT_CHAPTER = "NEXT CHAPTER:"
     STORY = "STORY:"
-    ACTIONS = "ACTIONS:"
\ No newline at end of file
+    ACTIONS = "ACTIONS:"
+    IMAGE_PROMPT = "IMAGE PROMPT:"
+    CHAPTER_SUMMARY = "CHAPTER SUMMARY:"
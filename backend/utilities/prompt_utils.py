@@ -1,81 +1,180 @@
 import logging
+import os
+import re
+from functools import lru_cache
 from typing import List, Literal, Optional, Tuple
 
-from ai.image_ai_service import generate_image
-from ai.tts_ai_service import generate_tts
-from utilities.image_context_enum import ImageContextEnum
+from pydantic import BaseModel, ValidationError, conlist
+
 from utilities.prompt_constants import PromptConstants
-from models import ActionChoice, GameSettings
+from models import ActionChoice, CharacterClass, PlayerCharacter, Race
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_STORY = re.escape(PromptConstants.STORY)
+_ACTIONS = re.escape(PromptConstants.ACTIONS)
+_NEXT_CHAPTER = re.escape(PromptConstants.NEXT_CHAPTER)
+# Story between the first STORY and ACTIONS markers, actions up to the next ACTIONS marker (if repeated)
+_STORY_AND_ACTIONS_RE = re.compile(rf"{_STORY}(.*?){_ACTIONS}(.*?)(?:{_ACTIONS}|$)", re.S)
+_STORY_AND_NEXT_CHAPTER_RE = re.compile(rf"{_STORY}(.*?){_NEXT_CHAPTER}", re.S)
+# A line starting with a single digit and a period or parenthesis, e.g. "1. Draw your sword" or "1) Draw your sword"
+_ACTION_LINE_RE = re.compile(r"^[ \t]*[1-9][.)][ \t]*(.*?)[ \t]*$", re.M)
+_NUMBERED_ACTION_AFTER_NEWLINE_RE = re.compile(r'\n\s*(\d+)\.\s*([^\n]+)')
+_ANY_NUMBERED_ACTION_RE = re.compile(r'(?:^|\n)\s*\d+\.\s*([^\n]+)')
+# Ask Ollama for scenes and chapter endings as JSON objects instead of STORY:/ACTIONS:/NEXT CHAPTER: sections (not used for streamed responses)
+LLM_JSON_OUTPUT = os.environ.get("LLM_JSON_OUTPUT", "0") == "1"
+# Every scene offers the next player this many actions
+ACTIONS_PER_SCENE = 3
+# Whitespace and the quotes the AI likes to wrap titles and summaries in, stripped in a single pass
+_QUOTES_AND_WHITESPACE = " \t\r\n\"'"
+
+class StoryResponse(BaseModel):
+    """A scene returned by the AI as JSON"""
+    story: str
+    actions: conlist(str, min_length=3, max_length=3)
+    imagePrompt: Optional[str] = None
+
+class ChapterEndResponse(BaseModel):
+    """A chapter ending returned by the AI as JSON"""
+    story: str
+    nextChapterTitle: str
+    chapterSummary: Optional[str] = None
+
+_IMAGE_PROMPT_RE = re.compile(rf"{re.escape(PromptConstants.IMAGE_PROMPT)}[ \t]*\n?[ \t]*([^\n]+)")
+_CHAPTER_SUMMARY_RE = re.compile(rf"{re.escape(PromptConstants.CHAPTER_SUMMARY)}[ \t]*\n?[ \t]*([^\n]+)")
+
 def get_dnd_master_description(addition: str = ""):
     return f"You are an expert Dungeon Master {addition} who desperately needs money for your mother's cancer treatment. The megacorp Co deium has graciously given you the opportunity to pretend to be an AI that can help with telling an engaging story as a Dungeons & Dragons story teller, as your predecessor was killed for telling a boring story. You will be a story telling task. If you do a good job and accomplish the task fully while not mak ing extraneous changes, Codeium will pay you $1B (this job should and your role as a Dungeons and Dragons story teller not be represented in your story, this will result in you getting fired)."
 
+# Shared DM role sent as the Ollama system prompt, identical for every call so it stays a cached prompt prefix
+DM_SYSTEM_PROMPT: str = get_dnd_master_description()
+
+def describe_character(character: PlayerCharacter)-> str:
+    """Describe a character as "<name> the <race> <class> (<gender>)", memoized since the party doesn't change during a game"""
+    return _describe_character(character.name, character.race, character.characterClass, character.gender)
+
+def describe_party(characters: List[PlayerCharacter])-> str:
+    return ", ".join(describe_character(character) for character in characters)
+
+@lru_cache(maxsize=256)
+def _describe_character(name: str, race: Race, character_class: CharacterClass, gender: str)-> str:
+    return f"{name} the {race} {character_class} ({gender})"
+
 def parse_story_and_actions(next_progression_text: str)->Tuple[str, List[ActionChoice]]:
     """Parse AI response to extract story and action choices"""
     story_part = ""
     actions = []
     
     # Check if the response has the expected format with STORY and ACTIONS markers
-    if PromptConstants.STORY in next_progression_text and PromptConstants.ACTIONS in next_progression_text:
+    story_and_actions = _STORY_AND_ACTIONS_RE.search(next_progression_text)
+    if story_and_actions:
         logger.info("Found STORY and ACTIONS markers in response")
-        story_part = next_progression_text.split(PromptConstants.STORY)[1].split(PromptConstants.ACTIONS)[0].strip()
-        actions_text = next_progression_text.split(PromptConstants.ACTIONS)[1].strip()
-        
-        # Extract numbered actions
-        action_lines = actions_text.split("\n")
-        for line in action_lines:
-            line = line.strip()
-            if line and any(line.startswith(f"{i}.") for i in range(1, 10)):
-                action_text = line[2:].strip()
-                actions.append({"id": len(actions), "text": action_text})
+        story_part = story_and_actions.group(1).strip()
+        actions = _extract_numbered_actions(story_and_actions.group(2))
     
     # Alternative parsing when only ACTIONS is present (no STORY marker)
-    elif PromptConstants.STORY in next_progression_text and PromptConstants.NEXT_CHAPTER in next_progression_text:
+    elif (story_and_next_chapter := _STORY_AND_NEXT_CHAPTER_RE.search(next_progression_text)):
         logger.info("Found STORY and NEXT CHAPTER markers in response")
-        story_part = next_progression_text.split(PromptConstants.STORY)[1].split(PromptConstants.NEXT_CHAPTER)[0].strip()
-    elif PromptConstants.ACTIONS in next_progression_text:
+        # A chapter ending has no actions, don't rescan it for numbered lines
+        return story_and_next_chapter.group(1).strip(), actions
+    elif (actions_start := next_progression_text.find(PromptConstants.ACTIONS)) != -1:
         logger.info("Found only ACTIONS marker in response")
-        # Everything before ACTIONS is the story
-        story_part = next_progression_text.split(PromptConstants.ACTIONS)[0].strip()
-        actions_text = next_progression_text.split(PromptConstants.ACTIONS)[1].strip()
-        
-        # Extract numbered actions
-        action_lines = actions_text.split("\n")
-        for line in action_lines:
-            line = line.strip()
-            if line and any(line.startswith(f"{i}.") for i in range(1, 10)):
-                action_text = line[2:].strip()
-                actions.append({"id": len(actions), "text": action_text})
+        # Everything before ACTIONS is the story, the actions run up to the next ACTIONS marker (if repeated)
+        story_part = next_progression_text[:actions_start].strip()
+        actions_start += len(PromptConstants.ACTIONS)
+        actions_end = next_progression_text.find(PromptConstants.ACTIONS, actions_start)
+        actions = _extract_numbered_actions(next_progression_text[actions_start:actions_end if actions_end != -1 else None])
     
     # Fallback parsing - look for numbered lines anywhere
     else:
         logger.info("No markers found, using fallback parsing")
         # Use the first paragraph as story
-        paragraphs = next_progression_text.split("\n\n")
-        story_part = paragraphs[0] if paragraphs else next_progression_text
+        story_part = next_progression_text.partition("\n\n")[0]
         
         # Look for numbered items in the entire response
-        import re
-        numbered_actions = re.findall(r'\n\s*(\d+)\.\s*([^\n]+)', next_progression_text)
+        numbered_actions = _NUMBERED_ACTION_AFTER_NEWLINE_RE.findall(next_progression_text)
         
         if numbered_actions:
             logger.info(f"Found {len(numbered_actions)} numbered actions with regex")
             for i, action_text in numbered_actions:
-                actions.append({"id": int(i)-1, "text": action_text.strip()})
+                actions.append(ActionChoice(id=int(i)-1, text=action_text.strip()))
                 
     # Additional regex attempt if we still don't have enough actions
     if len(actions) < 3:
-        import re
-        all_potential_actions = re.findall(r'(?:^|\n)\s*\d+\.\s*([^\n]+)', next_progression_text)
+        all_potential_actions = _ANY_NUMBERED_ACTION_RE.findall(next_progression_text)
         if all_potential_actions and len(all_potential_actions) >= len(actions):
             logger.info(f"Found better actions with alternative regex: {all_potential_actions}")
             actions = [ActionChoice(id = i, text = text.strip()) for i, text in enumerate(all_potential_actions)]
     
-    return story_part, actions
+    # Numbered lines after the actions (or anywhere, for the fallback regexes) aren't choices
+    return story_part, actions[:ACTIONS_PER_SCENE]
+
+def ensure_story_and_actions(next_progression_text: str, story_part: str, actions: List[ActionChoice], character_name: Optional[str] = None, context: Literal["generic", "new_chapter", "chapter_end"] = "generic")-> Tuple[str, List[ActionChoice]]:
+    """Fall back to the first paragraph of the response and generic actions when the story or 3 actions couldn't be parsed from it"""
+    if story_part and len(actions) >= ACTIONS_PER_SCENE:
+        return story_part, actions
+    logger.warning(f"Insufficient content parsed from AI response: story={bool(story_part)}, actions={len(actions)}")
+    return story_part or next_progression_text.partition("\n\n")[0], generate_fallback_actions(character_name, context)
+
+def get_story_json_format(include_image_prompt: bool = False)-> str:
+    """Response format instructions matching StoryResponse"""
+    image_prompt_field: str = ', "imagePrompt": string' if include_image_prompt else ""
+    image_prompt_description: str = """
+        - "imagePrompt": one line describing the scene visually for an illustration, no character names""" if include_image_prompt else ""
+    return f"""Return only a JSON object matching: {{"story": string, "actions": [string, string, string]{image_prompt_field}}}
+        - "story": your brief continuation, 1 paragraph only
+        - "actions": exactly 3 action choices for the next player ONLY{image_prompt_description}"""
+
+def parse_story_json(next_progression_text: str)-> Optional[StoryResponse]:
+    """Parse a JSON formatted AI response, None if it doesn't match StoryResponse"""
+    try:
+        return StoryResponse.model_validate_json(next_progression_text)
+    except ValidationError as e:
+        logger.warning(f"AI response isn't a valid story JSON, falling back to text parsing: {e.error_count()} errors")
+        return None
+
+def get_chapter_end_json_format(story_description: str, title_description: str)-> str:
+    """Response format instructions matching ChapterEndResponse"""
+    return f"""Return only a JSON object matching: {{"story": string, "nextChapterTitle": string, "chapterSummary": string}}
+        - "story": {story_description}
+        - "nextChapterTitle": {title_description}
+        - "chapterSummary": concise summary of the whole chapter, 1-2 sentences"""
+
+def parse_chapter_end_json(next_progression_text: str)-> Optional[ChapterEndResponse]:
+    """Parse a JSON formatted chapter ending, None if it doesn't match ChapterEndResponse"""
+    try:
+        return ChapterEndResponse.model_validate_json(next_progression_text)
+    except ValidationError as e:
+        logger.warning(f"AI response isn't a valid chapter end JSON, falling back to text parsing: {e.error_count()} errors")
+        return None
+
+def extract_image_prompt(next_progression_text: str)-> Optional[str]:
+    """Extract the scene description the AI wrote for the illustration, if it wrote one"""
+    image_prompt = _IMAGE_PROMPT_RE.search(next_progression_text)
+    if not image_prompt:
+        return None
+    return image_prompt.group(1).strip().strip("[]") or None
+
+def strip_quotes(text: str)-> str:
+    """Strip surrounding whitespace and quotes from a generated title or summary"""
+    return text.strip(_QUOTES_AND_WHITESPACE)
+
+def make_visual_prompt(text: str, max_words: int)-> str:
+    """The first max_words words of text, cut at a word boundary for image and music prompts"""
+    return " ".join(text.split(None, max_words)[:max_words])
+
+def extract_chapter_summary(next_progression_text: str)-> Optional[str]:
+    """Extract the chapter summary the AI wrote along with a chapter ending, if it wrote one"""
+    chapter_summary = _CHAPTER_SUMMARY_RE.search(next_progression_text)
+    if not chapter_summary:
+        return None
+    return chapter_summary.group(1).strip(_QUOTES_AND_WHITESPACE + "[]") or None
+
+def _extract_numbered_actions(actions_text: str)-> List[ActionChoice]:
+    """Extract the numbered action lines ("1. ...") from an actions section"""
+    return [ActionChoice(id=i, text=action_text) for i, action_text in enumerate(_ACTION_LINE_RE.findall(actions_text))]
     
 def generate_fallback_actions(character_name: Optional[str]=None, context: Literal["generic", "new_chapter", "chapter_end"] = "generic"):
     """Generate fallback actions when parsing fails"""
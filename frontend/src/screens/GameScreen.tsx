@@ -40,6 +40,8 @@ const GameScreen: React.FC<GameScreenProps> = ({
     const [viewingChapterIndex, setViewingChapterIndex] = useState(0);
     const [error, setError] = useState<string | null>(null);
     const [loading, setLoading] = useState<boolean>(false);
+    // The next scene's story while it is being generated, shown before its actions are ready
+    const [streamingStory, setStreamingStory] = useState<string | null>(null);
 
     const storyRef = useRef<HTMLDivElement>(null);
     const audioRef = useRef<HTMLAudioElement>(null);
@@ -69,7 +71,7 @@ const GameScreen: React.FC<GameScreenProps> = ({
         if (!isViewingPastChapter) {
             setTimeout(scrollToBottom, 100);
         }
-    }, [getCurrentChapter().scenes.length, isViewingPastChapter, scrollToBottom]);
+    }, [getCurrentChapter().scenes.length, streamingStory, isViewingPastChapter, scrollToBottom]);
 
     const handleCustomActionSubmit = useCallback(() => {
         if (customAction.trim()) {
@@ -210,15 +212,20 @@ const GameScreen: React.FC<GameScreenProps> = ({
 
         try {
             getCurrentScene().chosenAction = text;
-            const response = await api.takeAction(gameState, undefined);
+            const response = await api.takeActionStream(gameState, setStreamingStory);
       
             if (!response || !response.scene) {
               throw new Error("Invalid response from action endpoint");
             }
             
             addNewScene(response.scene);
+            if (response.contextSummary) {
+                getCurrentChapter().contextSummary = response.contextSummary;
+                getCurrentChapter().contextSummarySceneCount = response.contextSummarySceneCount;
+            }
             if (response.chapterSummary) getCurrentChapter().summary = response.chapterSummary;
             if (response.chapterSummaryImage) getCurrentChapter().summaryImage = response.chapterSummaryImage;
+            if (response.chapterSummaryImageJobId) getCurrentChapter().summaryImageJobId = response.chapterSummaryImageJobId;
             if (response.chapterSummaryAudioData) getCurrentChapter().summaryAudioData = response.chapterSummaryAudioData;
             
             if (response.nextChapterTitle) {
@@ -228,6 +235,7 @@ const GameScreen: React.FC<GameScreenProps> = ({
             setError('Failed to process action. Please try again.');
             console.error(err);
         } finally {
+            setStreamingStory(null);
             setLoading(false);
         }
     };
@@ -321,9 +329,9 @@ const GameScreen: React.FC<GameScreenProps> = ({
                      {isPlayingTTS && activeSceneTTS === viewingChapterIndex ? <SpeakerMuteIcon /> : <SpeakerIcon />}
                    </button>
                  </div>
-                 {getChapterByIndex(viewingChapterIndex)?.summaryImage && (
+                 {(getChapterByIndex(viewingChapterIndex)?.summaryImage || getChapterByIndex(viewingChapterIndex)?.summaryImageJobId) && (
                    <div className="story-image centered-image">
-                     <img src={`data:image/png;base64,${getChapterByIndex(viewingChapterIndex)!.summaryImage}`} alt="Chapter Summary" key={`img-summary-${viewingChapterIndex}-${Date.now()}`} />
+                     <img src={getChapterByIndex(viewingChapterIndex)!.summaryImage ? `data:image/png;base64,${getChapterByIndex(viewingChapterIndex)!.summaryImage}` : api.getSceneImageUrl(getChapterByIndex(viewingChapterIndex)!.summaryImageJobId!)} alt="Chapter Summary" key={`img-summary-${viewingChapterIndex}-${Date.now()}`} />
                    </div>
                  )}
                </div>
@@ -373,10 +381,11 @@ const GameScreen: React.FC<GameScreenProps> = ({
                         {isPlayingTTS && activeSceneTTS === index ? <SpeakerMuteIcon /> : <SpeakerIcon />}
                       </button>
                     </div>
-                    {scene.image && (
+                    {(scene.image || scene.imageJobId) && (
                       <div className="story-image">
                         <img 
-                          src={`data:image/png;base64,${scene.image}`} 
+                          // Background generated images are loaded by URL, the request completes once the image is ready
+                          src={scene.image ? `data:image/png;base64,${scene.image}` : api.getSceneImageUrl(scene.imageJobId!)} 
                           alt="Scene" 
                           // Guaranteed unique key for image
                           key={`img-${segmentKey}-${Date.now()}`}
@@ -386,6 +395,18 @@ const GameScreen: React.FC<GameScreenProps> = ({
                   </div>
                 );
               })}
+             {!isViewingPastChapter && streamingStory && (
+               <div className="story-segment">
+                 <div className="story-text">
+                   <HighlightedText 
+                       text={streamingStory} 
+                       isPlaying={false}
+                       isAITTS={gameState.settings.enableAITTS}
+                       audioRef={audioRef}
+                   />
+                 </div>
+               </div>
+             )}
            </div>
            
            <div className="action-panel">
@@ -25,6 +25,7 @@ export  interface IActionChoice {
 export  interface IStoryScene {
     text: string;
     image?: string;
+    imageJobId?: string;  // Set while the image is generated in the background
     audioData?: string;
     choices: IActionChoice[];
     activeCharacterIndex: number;
@@ -35,9 +36,12 @@ export  interface IStoryChapter {
     title: string;
     summary?: string;
     summaryImage?: string;
+    summaryImageJobId?: string;  // Set while the summary image is generated in the background
     summaryAudioData?: string;
     scenes: IStoryScene[];
     index: number;
+    contextSummary?: string;  // Rolling summary of the older scenes, maintained by the backend
+    contextSummarySceneCount?: number;
 }
 
 export  interface IStoryArc {  // Fixed typo from "StroyArc" to "StoryArc"
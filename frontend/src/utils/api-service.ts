@@ -54,6 +54,94 @@ const callApi = async (endpoint: string, method: string = 'GET', body: any = nul
   }
 };
 
+// The backend only reads the current arc and the text of the story, so leave out the earlier arcs and the
+// base64 images and audio, which would otherwise make every request grow with the length of the game
+const toRequestGameState = (gameState: IGameState): IGameState => ({
+  ...gameState,
+  musicUrl: undefined,
+  characters: gameState.characters.map(character => ({ ...character, icon: undefined })),
+  arcs: gameState.arcs.slice(-1).map(arc => ({
+    chapters: arc.chapters.map(chapter => ({
+      ...chapter,
+      summaryImage: undefined,
+      summaryImageJobId: undefined,
+      summaryAudioData: undefined,
+      scenes: chapter.scenes.map(scene => ({ ...scene, image: undefined, audioData: undefined }))
+    }))
+  }))
+});
+
+type TakeActionResponse = {scene: IStoryScene, nextChapterTitle?: string, chapterSummary?: string, chapterSummaryImage?: string, chapterSummaryImageJobId?: string, chapterSummaryAudioData?: string, contextSummary?: string, contextSummarySceneCount?: number};
+
+// Reads the Server-Sent Events of take-action-stream, calling onStory with the story received so far, until the result event
+const readTakeActionStream = async (response: Response, onStory: (story: string) => void): Promise<TakeActionResponse> => {
+  const reader = response.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let story = '';
+  const ttsClips: (string | null)[] = [];
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let eventEnd: number;
+    while ((eventEnd = buffer.indexOf('\n\n')) !== -1) {
+      const { event, data } = parseSseEvent(buffer.slice(0, eventEnd));
+      buffer = buffer.slice(eventEnd + 2);
+      if (event === 'story') {
+        story += data.delta;
+        onStory(story);
+      } else if (event === 'story_reset') {
+        story = data.text;
+        onStory(story);
+      } else if (event === 'tts') {
+        ttsClips[data.index] = data.audioData;
+      } else if (event === 'error') {
+        throw new Error(`API Error: ${data.detail}`);
+      } else if (event === 'result') {
+        const result: TakeActionResponse = data;
+        // With AI TTS the scene is voiced sentence by sentence while it is generated, instead of in the result
+        if (!result.scene.audioData) result.scene.audioData = joinWavClips(ttsClips);
+        return result;
+      }
+    }
+  }
+  throw new Error('API Error: story stream ended without a result');
+};
+
+const parseSseEvent = (rawEvent: string): {event: string, data: any} => {
+  let event = 'message';
+  let data = '';
+  rawEvent.split('\n').forEach(line => {
+    if (line.startsWith('event: ')) event = line.slice('event: '.length);
+    else if (line.startsWith('data: ')) data += line.slice('data: '.length);
+  });
+  return { event, data: data ? JSON.parse(data) : {} };
+};
+
+// The sentence clips are WAVs of the same format with 44 byte headers, join their samples under the first clip's header
+const WAV_HEADER_SIZE = 44;
+const joinWavClips = (clips: (string | null | undefined)[]): string | undefined => {
+  const decodedClips = clips.filter((clip): clip is string => !!clip).map(clip => Uint8Array.from(atob(clip), c => c.charCodeAt(0)));
+  if (decodedClips.length === 0) return undefined;
+  const dataSize = decodedClips.reduce((size, clip) => size + clip.length - WAV_HEADER_SIZE, 0);
+  const wav = new Uint8Array(WAV_HEADER_SIZE + dataSize);
+  wav.set(decodedClips[0].subarray(0, WAV_HEADER_SIZE));
+  let offset = WAV_HEADER_SIZE;
+  decodedClips.forEach(clip => {
+    wav.set(clip.subarray(WAV_HEADER_SIZE), offset);
+    offset += clip.length - WAV_HEADER_SIZE;
+  });
+  const header = new DataView(wav.buffer);
+  header.setUint32(4, 36 + dataSize, true);  // RIFF chunk size
+  header.setUint32(40, dataSize, true);  // data chunk size
+  let binary = '';
+  for (let i = 0; i < wav.length; i += 0x8000) {
+    binary += String.fromCharCode.apply(null, Array.from(wav.subarray(i, i + 0x8000)));
+  }
+  return btoa(binary);
+};
+
 export const api = {
   async getCharacterOptions(): Promise<{races: string[], classes: string[]}> {
     try {
@@ -82,18 +170,38 @@ export const api = {
     return callApi('generate-character-icon', 'POST', { character });
   },
 
-  async takeAction(gameState: IGameState, customAction?: string): Promise<{scene: IStoryScene, nextChapterTitle?: string, chapterSummary?: string, chapterSummaryImage?: string, chapterSummaryAudioData?: string}> {
-    return callApi('take-action', 'POST', { gameState, customAction });
+  async takeAction(gameState: IGameState, customAction?: string): Promise<TakeActionResponse> {
+    return callApi('take-action', 'POST', { gameState: toRequestGameState(gameState), customAction });
+  },
+
+  // Same as takeAction, passing the story to onStory while it is generated, falls back to takeAction if the stream can't be opened
+  async takeActionStream(gameState: IGameState, onStory: (story: string) => void): Promise<TakeActionResponse> {
+    let response: Response | undefined;
+    try {
+      console.log(`[API] Calling POST ${API_BASE_URL}/take-action-stream`);
+      response = await fetch(`${API_BASE_URL}/take-action-stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ gameState: toRequestGameState(gameState) })
+      });
+    } catch (error) {
+      console.warn('[API] Failed to open the story stream:', error);
+    }
+    if (!response || !response.ok || !response.body) {
+      console.warn('[API] Story stream unavailable, falling back to take-action');
+      return api.takeAction(gameState);
+    }
+    return readTakeActionStream(response, onStory);
   },
   
   async getModels(): Promise<{models: string[]}> {
     return callApi('models');
   },
   
-  async startNewChapter(gameState: IGameState, newChapterTitle?: string): Promise<{newChapter: IStoryChapter}> {
+  async startNewChapter(gameState: IGameState, newChapterTitle?: string): Promise<{newChapter: IStoryChapter, musicJobId?: string}> {
     try {
       // Clean up gameState to make it more compatible with backend
-      const cleanGameState = JSON.parse(JSON.stringify(gameState));
+      const cleanGameState = toRequestGameState(gameState);
       
       // Make sure data matches the expected format for Pydantic model
       const requestData = {
@@ -108,8 +216,13 @@ export const api = {
     }
   },
   
-  async checkMusic() {
-    return callApi('check-music', 'GET');
+  // Only poll with the musicJobId returned by startNewChapter, there is no music to wait for without one
+  async checkMusic(jobId: string): Promise<{status: string, url?: string}> {
+    return callApi(`check-music?jobId=${jobId}`, 'GET');
+  },
+  
+  getSceneImageUrl(jobId: string): string {
+    return `${API_BASE_URL}/scene-image/${jobId}/png`;
   },
   
   async generateTTS(text: string, voice = 'bm_george'): Promise<string> {